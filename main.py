@@ -3,17 +3,53 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from src.auth.login import router as auth_router
 from src.users.users import router as users_router
-from src.documents.document import router as documents_router, category_router as categories_router, public_router as public_documents_router
+from src.documents.document import router as documents_router, category_router as categories_router, public_router as public_documents_router, admin_router as documents_admin_router
+from src.documents.embedding_jobs import EMBEDDING_ASYNC_WRITES, requeue_unfinished_documents
+from src.documents.vector_index import VECTOR_INDEX_ENABLED, load_vector_index
+from src.documents.chunk_backfill import CHUNK_BACKFILL_ON_STARTUP, backfill_document_chunks
 from fastapi_mcp import FastApiMCP
+from contextlib import asynccontextmanager
+import asyncio
 
 from datetime import datetime
 
+
+def report_backfill_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Error backfilling document chunks: {task.exception()}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # เอกสารที่ยังสร้าง embedding ไม่เสร็จก่อน restart ให้กลับเข้าคิว
+    if EMBEDDING_ASYNC_WRITES:
+        try:
+            print(f"Requeued {await requeue_unfinished_documents()} pending embedding jobs")
+        except Exception as e:
+            print(f"❌ Error requeueing embedding jobs: {e}")
+    # โหลด documents.embedding เข้า index ในหน่วยความจำ
+    if VECTOR_INDEX_ENABLED:
+        try:
+            print(f"Loaded {await asyncio.to_thread(load_vector_index)} documents into vector index")
+        except Exception as e:
+            print(f"❌ Error loading vector index: {e}")
+    # เอกสารที่ยังไม่มี chunk ให้สร้าง chunk เป็นงานเบื้องหลัง (ไม่รอให้เสร็จก่อนรับ request)
+    backfill_task = None
+    if CHUNK_BACKFILL_ON_STARTUP:
+        backfill_task = asyncio.create_task(backfill_document_chunks())
+        backfill_task.add_done_callback(report_backfill_error)
+    yield
+    if backfill_task is not None and not backfill_task.done():
+        backfill_task.cancel()
+
+
 app = FastAPI(
     title="Smart Documents API",
     description="API for Smart Documents Management System",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 
@@ -23,6 +59,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 
@@ -34,6 +71,7 @@ app.include_router(users_router, prefix="/users", tags=["Users"])
 app.include_router(documents_router, prefix="/documents", tags=["Documents"])
 app.include_router(categories_router, prefix="/categories", tags=["Categories"])
 app.include_router(public_documents_router, prefix="/public-documents", tags=["Public Documents"])
+app.include_router(documents_admin_router, prefix="/admin", tags=["Admin"])
 
 mcp = FastApiMCP(app)
 mcp.mount()
@@ -0,0 +1,69 @@
+-- ตาราง chunk ของเอกสาร: แต่ละเอกสารถูกแบ่งเป็นหลาย chunk พร้อม embedding ของตัวเอง
+-- หมายเหตุ: ขนาด vector ต้องตรงกับ LM_STUDIO_EMBEDDING_MODEL (qwen3-embedding-0.6b = 1024)
+
+create table if not exists smart_documents.document_chunks (
+    id bigint generated always as identity primary key,
+    document_id bigint not null references smart_documents.documents (id) on delete cascade,
+    chunk_index int not null,
+    content text not null,
+    char_offset int not null,
+    heading text,
+    embedding vector(1024),
+    created_at timestamptz not null default now(),
+    unique (document_id, chunk_index)
+);
+
+create index if not exists document_chunks_embedding_idx
+    on smart_documents.document_chunks
+    using hnsw (embedding vector_cosine_ops);
+
+-- ค้นหา chunk ที่ตรงที่สุดของแต่ละเอกสาร (หนึ่งแถวต่อเอกสาร)
+create or replace function smart_documents.search_document_chunks(
+    query_embedding vector(1024),
+    match_count int default 5,
+    match_threshold float default 0.5,
+    filter_category text default null
+)
+returns table (
+    document_id bigint,
+    title text,
+    category_name text,
+    chunk_index int,
+    content text,
+    char_offset int,
+    similarity float
+)
+language sql stable
+as $$
+    with candidates as (
+        select
+            c.document_id,
+            c.chunk_index,
+            c.content,
+            c.char_offset,
+            1 - (c.embedding <=> query_embedding) as similarity
+        from smart_documents.document_chunks c
+        join smart_documents.documents d on d.id = c.document_id
+        where filter_category is null or d.category_name = filter_category
+        order by c.embedding <=> query_embedding
+        limit match_count * 8
+    ),
+    best as (
+        select distinct on (document_id) *
+        from candidates
+        order by document_id, similarity desc
+    )
+    select
+        b.document_id,
+        d.title,
+        d.category_name,
+        b.chunk_index,
+        b.content,
+        b.char_offset,
+        b.similarity
+    from best b
+    join smart_documents.documents d on d.id = b.document_id
+    where b.similarity > match_threshold
+    order by b.similarity desc
+    limit match_count;
+$$;
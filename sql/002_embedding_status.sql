@@ -0,0 +1,14 @@
+-- สถานะการสร้าง embedding เบื้องหลังของเอกสาร (pending / ready / failed)
+
+alter table smart_documents.documents
+    alter column embedding drop not null;
+
+alter table smart_documents.documents
+    add column if not exists embedding_status text not null default 'ready'
+        check (embedding_status in ('pending', 'ready', 'failed')),
+    add column if not exists embedding_error text,
+    add column if not exists embedding_updated_at timestamptz;
+
+create index if not exists documents_embedding_status_idx
+    on smart_documents.documents (embedding_status)
+    where embedding_status <> 'ready';
@@ -0,0 +1,19 @@
+-- บันทึก embedding หลายเอกสารในคำสั่งเดียว (ใช้โดย src/documents/reembed.py)
+-- items: [{"id": 1, "embedding": [0.1, ...]}, ...]
+
+create or replace function smart_documents.bulk_update_embeddings(items jsonb)
+returns int
+language sql
+as $$
+    with updated as (
+        update smart_documents.documents d
+        set embedding = (item ->> 'embedding')::vector,
+            embedding_status = 'ready',
+            embedding_error = null,
+            embedding_updated_at = now()
+        from jsonb_array_elements(items) as item
+        where d.id = (item ->> 'id')::bigint
+        returning d.id
+    )
+    select count(*)::int from updated;
+$$;
@@ -0,0 +1,92 @@
+-- ค้นหาแบบ 2 ขั้น: ขั้นแรกใช้ vector ที่ quantize แล้ว (binary / halfvec) ผ่าน expression index
+-- ขั้นที่สองคำนวณคะแนนใหม่ด้วย embedding เต็มความละเอียด
+-- ต้องใช้ pgvector >= 0.7 (binary_quantize, bit, halfvec)
+-- index ของโหมดที่ quantize แล้วสร้างด้วย configure_chunk_vector_indexes() (sql/014_chunk_vector_indexes.sql)
+-- ให้มีเฉพาะ HNSW ของโหมดที่ใช้ (SEARCH_QUANTIZATION) ไม่ใช่ทุกโหมดพร้อมกัน
+
+drop function if exists smart_documents.search_document_chunks(vector, int, float, text);
+
+create or replace function smart_documents.search_document_chunks(
+    query_embedding vector(1024),
+    match_count int default 5,
+    match_threshold float default 0.5,
+    filter_category text default null,
+    quantization text default null,     -- null = exact, 'binary', 'halfvec'
+    rescore_factor int default 4        -- จำนวน candidate ขั้นแรก = match_count * 8 * rescore_factor
+)
+returns table (
+    document_id bigint,
+    title text,
+    category_name text,
+    chunk_index int,
+    content text,
+    char_offset int,
+    similarity float
+)
+language plpgsql stable
+as $$
+#variable_conflict use_column
+declare
+    candidate_limit int := match_count * 8;
+    candidate_ids bigint[];
+begin
+    if quantization = 'binary' then
+        select array_agg(s.id) into candidate_ids from (
+            select c.id
+            from smart_documents.document_chunks c
+            join smart_documents.documents d on d.id = c.document_id
+            where filter_category is null or d.category_name = filter_category
+            order by binary_quantize(c.embedding)::bit(1024) <~> binary_quantize(query_embedding)
+            limit candidate_limit * rescore_factor
+        ) s;
+    elsif quantization = 'halfvec' then
+        select array_agg(s.id) into candidate_ids from (
+            select c.id
+            from smart_documents.document_chunks c
+            join smart_documents.documents d on d.id = c.document_id
+            where filter_category is null or d.category_name = filter_category
+            order by c.embedding::halfvec(1024) <=> query_embedding::halfvec(1024)
+            limit candidate_limit * rescore_factor
+        ) s;
+    else
+        select array_agg(s.id) into candidate_ids from (
+            select c.id
+            from smart_documents.document_chunks c
+            join smart_documents.documents d on d.id = c.document_id
+            where filter_category is null or d.category_name = filter_category
+            order by c.embedding <=> query_embedding
+            limit candidate_limit
+        ) s;
+    end if;
+
+    return query
+    with candidates as (
+        select
+            c.document_id,
+            c.chunk_index,
+            c.content,
+            c.char_offset,
+            1 - (c.embedding <=> query_embedding) as similarity
+        from smart_documents.document_chunks c
+        where c.id = any(candidate_ids)
+    ),
+    best as (
+        select distinct on (candidates.document_id) *
+        from candidates
+        order by candidates.document_id, candidates.similarity desc
+    )
+    select
+        b.document_id,
+        d.title,
+        d.category_name,
+        b.chunk_index,
+        b.content,
+        b.char_offset,
+        b.similarity
+    from best b
+    join smart_documents.documents d on d.id = b.document_id
+    where b.similarity > match_threshold
+    order by b.similarity desc
+    limit match_count;
+end;
+$$;
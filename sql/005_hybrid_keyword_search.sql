@@ -0,0 +1,65 @@
+-- ค้นหาด้วยคำ (trigram) บน chunk ของเอกสาร สำหรับ hybrid search
+-- เหมาะกับรหัสสินค้า/เลขชิ้นส่วนที่ vector search มักพลาด และใช้ได้กับภาษาไทยที่ไม่มีช่องว่างระหว่างคำ
+
+create extension if not exists pg_trgm;
+
+create index if not exists document_chunks_content_trgm_idx
+    on smart_documents.document_chunks
+    using gin (content gin_trgm_ops);
+
+create or replace function smart_documents.search_document_chunks_keyword(
+    query_text text,
+    match_count int default 5,
+    filter_category text default null
+)
+returns table (
+    document_id bigint,
+    title text,
+    category_name text,
+    chunk_index int,
+    content text,
+    char_offset int,
+    keyword_score float
+)
+language sql stable
+as $$
+    with params as (
+        select '%' || replace(replace(replace(query_text, '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+    ),
+    candidates as (
+        select
+            c.document_id,
+            c.chunk_index,
+            c.content,
+            c.char_offset,
+            -- พบคำค้นตรงตัว = 1.0, ไม่เช่นนั้นใช้ความคล้ายของ trigram
+            case
+                when c.content ilike p.pattern then 1.0
+                else word_similarity(query_text, c.content)
+            end as keyword_score
+        from smart_documents.document_chunks c
+        join smart_documents.documents d on d.id = c.document_id
+        cross join params p
+        where (c.content ilike p.pattern or query_text <% c.content)
+          and (filter_category is null or d.category_name = filter_category)
+        order by keyword_score desc
+        limit match_count * 8
+    ),
+    best as (
+        select distinct on (candidates.document_id) *
+        from candidates
+        order by candidates.document_id, candidates.keyword_score desc
+    )
+    select
+        b.document_id,
+        d.title,
+        d.category_name,
+        b.chunk_index,
+        b.content,
+        b.char_offset,
+        b.keyword_score
+    from best b
+    join smart_documents.documents d on d.id = b.document_id
+    order by b.keyword_score desc
+    limit match_count;
+$$;
@@ -0,0 +1,183 @@
+-- กรองผลการค้นหาตามแผนก (department) และหลายหมวดหมู่ภายในฟังก์ชันค้นหาโดยตรง
+-- แทนการดึงผลลัพธ์จำนวนมากแล้วกรองฝั่ง client
+
+create index if not exists categories_department_name_idx
+    on smart_documents.categories (department, name);
+
+create index if not exists documents_category_name_idx
+    on smart_documents.documents (category_name);
+
+drop function if exists smart_documents.search_document_chunks(vector, int, float, text, text, int);
+drop function if exists smart_documents.search_document_chunks_keyword(text, int, text);
+
+create or replace function smart_documents.search_document_chunks(
+    query_embedding vector(1024),
+    match_count int default 5,
+    match_threshold float default 0.5,
+    filter_category text default null,
+    quantization text default null,     -- null = exact, 'binary', 'halfvec'
+    rescore_factor int default 4,       -- จำนวน candidate ขั้นแรก = match_count * 8 * rescore_factor
+    filter_categories text[] default null,
+    filter_department text default null
+)
+returns table (
+    document_id bigint,
+    title text,
+    category_name text,
+    chunk_index int,
+    content text,
+    char_offset int,
+    similarity float
+)
+language plpgsql stable
+as $$
+#variable_conflict use_column
+declare
+    candidate_limit int := match_count * 8;
+    candidate_ids bigint[];
+begin
+    -- pgvector >= 0.8: สแกน HNSW ต่อเมื่อ filter ตัดผลลัพธ์ออกจนไม่พอ
+    -- เวอร์ชันก่อน 0.8 ไม่มีค่านี้ และบน PG15+ การตั้งค่าที่ไม่รู้จักใต้ prefix hnsw จะ error จึงต้องตรวจเวอร์ชันก่อน
+    if (
+        select string_to_array(e.extversion, '.')::int[] >= array[0, 8]
+        from pg_extension e
+        where e.extname = 'vector'
+    ) then
+        perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+    end if;
+
+    if quantization = 'binary' then
+        select array_agg(s.id) into candidate_ids from (
+            select c.id
+            from smart_documents.document_chunks c
+            join smart_documents.documents d on d.id = c.document_id
+            where (filter_category is null or d.category_name = filter_category)
+              and (filter_categories is null or d.category_name = any(filter_categories))
+              and (filter_department is null or d.category_name in (
+                  select cat.name from smart_documents.categories cat where cat.department = filter_department
+              ))
+            order by binary_quantize(c.embedding)::bit(1024) <~> binary_quantize(query_embedding)
+            limit candidate_limit * rescore_factor
+        ) s;
+    elsif quantization = 'halfvec' then
+        select array_agg(s.id) into candidate_ids from (
+            select c.id
+            from smart_documents.document_chunks c
+            join smart_documents.documents d on d.id = c.document_id
+            where (filter_category is null or d.category_name = filter_category)
+              and (filter_categories is null or d.category_name = any(filter_categories))
+              and (filter_department is null or d.category_name in (
+                  select cat.name from smart_documents.categories cat where cat.department = filter_department
+              ))
+            order by c.embedding::halfvec(1024) <=> query_embedding::halfvec(1024)
+            limit candidate_limit * rescore_factor
+        ) s;
+    else
+        select array_agg(s.id) into candidate_ids from (
+            select c.id
+            from smart_documents.document_chunks c
+            join smart_documents.documents d on d.id = c.document_id
+            where (filter_category is null or d.category_name = filter_category)
+              and (filter_categories is null or d.category_name = any(filter_categories))
+              and (filter_department is null or d.category_name in (
+                  select cat.name from smart_documents.categories cat where cat.department = filter_department
+              ))
+            order by c.embedding <=> query_embedding
+            limit candidate_limit
+        ) s;
+    end if;
+
+    return query
+    with candidates as (
+        select
+            c.document_id,
+            c.chunk_index,
+            c.content,
+            c.char_offset,
+            1 - (c.embedding <=> query_embedding) as similarity
+        from smart_documents.document_chunks c
+        where c.id = any(candidate_ids)
+    ),
+    best as (
+        select distinct on (candidates.document_id) *
+        from candidates
+        order by candidates.document_id, candidates.similarity desc
+    )
+    select
+        b.document_id,
+        d.title,
+        d.category_name,
+        b.chunk_index,
+        b.content,
+        b.char_offset,
+        b.similarity
+    from best b
+    join smart_documents.documents d on d.id = b.document_id
+    where b.similarity > match_threshold
+    order by b.similarity desc
+    limit match_count;
+end;
+$$;
+
+create or replace function smart_documents.search_document_chunks_keyword(
+    query_text text,
+    match_count int default 5,
+    filter_category text default null,
+    filter_categories text[] default null,
+    filter_department text default null
+)
+returns table (
+    document_id bigint,
+    title text,
+    category_name text,
+    chunk_index int,
+    content text,
+    char_offset int,
+    keyword_score float
+)
+language sql stable
+as $$
+    with params as (
+        select '%' || replace(replace(replace(query_text, '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+    ),
+    candidates as (
+        select
+            c.document_id,
+            c.chunk_index,
+            c.content,
+            c.char_offset,
+            -- พบคำค้นตรงตัว = 1.0, ไม่เช่นนั้นใช้ความคล้ายของ trigram
+            case
+                when c.content ilike p.pattern then 1.0
+                else word_similarity(query_text, c.content)
+            end as keyword_score
+        from smart_documents.document_chunks c
+        join smart_documents.documents d on d.id = c.document_id
+        cross join params p
+        where (c.content ilike p.pattern or query_text <% c.content)
+          and (filter_category is null or d.category_name = filter_category)
+          and (filter_categories is null or d.category_name = any(filter_categories))
+          and (filter_department is null or d.category_name in (
+              select cat.name from smart_documents.categories cat where cat.department = filter_department
+          ))
+        order by keyword_score desc
+        limit match_count * 8
+    ),
+    best as (
+        select distinct on (candidates.document_id) *
+        from candidates
+        order by candidates.document_id, candidates.keyword_score desc
+    )
+    select
+        b.document_id,
+        d.title,
+        d.category_name,
+        b.chunk_index,
+        b.content,
+        b.char_offset,
+        b.keyword_score
+    from best b
+    join smart_documents.documents d on d.id = b.document_id
+    order by b.keyword_score desc
+    limit match_count;
+$$;
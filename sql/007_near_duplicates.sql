@@ -0,0 +1,39 @@
+-- ตรวจหาเอกสารที่เนื้อหาเกือบซ้ำกัน (ใช้โดย src/documents/duplicates.py)
+
+-- รายการเอกสารที่เกือบซ้ำ ณ เวลาที่สร้าง embedding ล่าสุด [{"id", "title", "category_name", "similarity"}]
+alter table smart_documents.documents
+    add column if not exists near_duplicates jsonb;
+
+create index if not exists documents_embedding_idx
+    on smart_documents.documents
+    using hnsw (embedding vector_cosine_ops);
+
+create or replace function smart_documents.find_near_duplicates(
+    query_embedding vector(1024),
+    match_threshold float default 0.95,
+    match_count int default 5,
+    exclude_id bigint default null
+)
+returns table (
+    id bigint,
+    title text,
+    category_name text,
+    similarity float
+)
+language sql stable
+as $$
+    select *
+    from (
+        select
+            d.id,
+            d.title,
+            d.category_name,
+            1 - (d.embedding <=> query_embedding) as similarity
+        from smart_documents.documents d
+        where d.embedding is not null
+          and (exclude_id is null or d.id <> exclude_id)
+        order by d.embedding <=> query_embedding
+        limit match_count
+    ) nearest
+    where nearest.similarity >= match_threshold;
+$$;
@@ -0,0 +1,14 @@
+-- เอกสารพร้อมแผนกของหมวดหมู่ (ใช้โดย GET /documents/ เพื่อกรองตามแผนกใน request เดียว)
+-- หมายเหตุ: d.* ถูกขยายเป็นรายชื่อคอลัมน์ตอนสร้าง view ถ้าต้องการคอลัมน์ใหม่ของ documents ใน view
+-- ต้อง drop view (และฟังก์ชัน search_documents_* ใน 009) แล้วรันไฟล์นี้ใหม่
+-- ชื่อหมวดหมู่ต้องไม่ซ้ำกัน มิฉะนั้นเอกสารจะปรากฏซ้ำ
+
+create index if not exists categories_name_idx
+    on smart_documents.categories (name);
+
+create or replace view smart_documents.documents_with_department
+with (security_invoker = true)
+as
+    select d.*, c.department
+    from smart_documents.documents d
+    left join smart_documents.categories c on c.name = d.category_name;
@@ -0,0 +1,65 @@
+-- ค้นหาเอกสารในหน้ารายการ (GET /documents/?q=...&search_mode=...)
+-- - title: ilike บนชื่อเอกสาร (เดิม) ใช้ trigram index แทนการ scan ทั้งตาราง
+-- - fulltext: tsvector ของชื่อและเนื้อหา ใช้ 'english' (ตัดรูปคำภาษาอังกฤษ) ร่วมกับ 'simple' (คำอื่นๆ ตามที่เขียน)
+--   หมายเหตุ: Postgres ไม่มี config ภาษาไทย ข้อความไทยที่ไม่มีช่องว่างจะเป็น token เดียว จึงเหมาะกับคำภาษาอังกฤษ/คำที่คั่นด้วยช่องว่าง
+-- - trigram: ค้นหาบางส่วนของคำในชื่อและเนื้อหา ใช้ได้กับภาษาไทย
+
+create extension if not exists pg_trgm;
+
+create index if not exists documents_title_trgm_idx
+    on smart_documents.documents
+    using gin (title gin_trgm_ops);
+
+create index if not exists documents_data_trgm_idx
+    on smart_documents.documents
+    using gin (data gin_trgm_ops);
+
+alter table smart_documents.documents
+    add column if not exists search_vector tsvector
+        generated always as (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(data, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(data, '')), 'B')
+        ) stored;
+
+create index if not exists documents_search_vector_idx
+    on smart_documents.documents
+    using gin (search_vector);
+
+-- ฟังก์ชันค้นหาเป็น language sql stable ที่มี select เดียว Postgres จึง inline เข้าไปใน query ของ PostgREST ได้
+-- เงื่อนไข department/category_name, select เฉพาะคอลัมน์ และ limit/offset จึงถูกใช้พร้อม index
+-- (ไม่ต้องสร้างทุกแถวที่ตรง พร้อมคอลัมน์ data ก่อนกรอง)
+drop function if exists smart_documents.search_documents_list(text, text);
+
+-- full-text: เรียงตาม ts_rank_cd
+create or replace function smart_documents.search_documents_fulltext(query_text text)
+returns setof smart_documents.documents_with_department
+language sql stable
+as $$
+    select v.*
+    from smart_documents.documents_with_department v
+    join smart_documents.documents d on d.id = v.id
+    cross join (
+        select websearch_to_tsquery('english', query_text) || websearch_to_tsquery('simple', query_text) as tsq
+    ) q
+    where d.search_vector @@ q.tsq
+    order by ts_rank_cd(d.search_vector, q.tsq) desc, v.id;
+$$;
+
+-- trigram: ชื่อที่ตรงมาก่อน แล้วเรียงตามความคล้ายของชื่อ
+create or replace function smart_documents.search_documents_trigram(query_text text)
+returns setof smart_documents.documents_with_department
+language sql stable
+as $$
+    select v.*
+    from smart_documents.documents_with_department v
+    cross join (
+        select '%' || replace(replace(replace(query_text, '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+    ) p
+    where v.title ilike p.pattern or v.data ilike p.pattern
+    order by
+        (v.title ilike p.pattern) desc,
+        word_similarity(query_text, v.title) desc,
+        v.id;
+$$;
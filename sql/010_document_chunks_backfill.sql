@@ -0,0 +1,26 @@
+-- เอกสารที่ยังไม่มี chunk (เช่นเอกสารที่สร้างก่อน sql/001_document_chunks.sql)
+-- ใช้โดย src/documents/chunk_backfill.py ดึงทีละหน้าแบบ keyset (id > after_id)
+-- ข้ามเอกสาร pending เพราะ worker สร้าง embedding และ chunk ให้อยู่แล้ว (ไม่เขียนแข่งกัน)
+
+create or replace function smart_documents.documents_without_chunks(
+    after_id bigint default 0,
+    page_size int default 100
+)
+returns table (
+    id bigint,
+    data text
+)
+language sql stable
+as $$
+    select d.id, d.data
+    from smart_documents.documents d
+    where d.id > after_id
+      and d.embedding_status <> 'pending'
+      and not exists (
+          select 1
+          from smart_documents.document_chunks c
+          where c.document_id = d.id
+      )
+    order by d.id
+    limit page_size;
+$$;
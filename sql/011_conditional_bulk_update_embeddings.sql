@@ -0,0 +1,22 @@
+-- บันทึก embedding หลายเอกสารแบบมีเงื่อนไข (ใช้โดย src/documents/reembed.py)
+-- items: [{"id": 1, "embedding": [0.1, ...], "last_updated": "..."}, ...]
+-- ไม่เขียนทับเอกสารที่ถูกแก้ไขหลังจากอ่านไป (last_updated เปลี่ยน) หรือกำลังรอ embedding จากคิว (pending)
+-- คืนค่า id ของเอกสารที่บันทึกจริง
+
+drop function if exists smart_documents.bulk_update_embeddings(jsonb);
+
+create or replace function smart_documents.bulk_update_embeddings(items jsonb)
+returns setof bigint
+language sql
+as $$
+    update smart_documents.documents d
+    set embedding = (item ->> 'embedding')::vector,
+        embedding_status = 'ready',
+        embedding_error = null,
+        embedding_updated_at = now()
+    from jsonb_array_elements(items) as item
+    where d.id = (item ->> 'id')::bigint
+      and d.embedding_status <> 'pending'
+      and d.last_updated is not distinct from (item ->> 'last_updated')::timestamptz
+    returning d.id;
+$$;
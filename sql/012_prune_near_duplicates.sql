@@ -0,0 +1,29 @@
+-- ลบเอกสารที่ถูกลบออกจาก near_duplicates ของเอกสารอื่น (sql/007_near_duplicates.sql)
+-- ทำใน trigger เพื่อให้ครอบคลุมการลบทุกช่องทาง
+
+create index if not exists documents_near_duplicates_idx
+    on smart_documents.documents
+    using gin (near_duplicates jsonb_path_ops);
+
+create or replace function smart_documents.prune_near_duplicate_references()
+returns trigger
+language plpgsql
+as $$
+begin
+    update smart_documents.documents d
+    set near_duplicates = (
+        select coalesce(jsonb_agg(item), '[]'::jsonb)
+        from jsonb_array_elements(d.near_duplicates) as item
+        where (item ->> 'id')::bigint <> old.id
+    )
+    where d.near_duplicates @> jsonb_build_array(jsonb_build_object('id', old.id));
+    return old;
+end;
+$$;
+
+drop trigger if exists documents_prune_near_duplicates on smart_documents.documents;
+
+create trigger documents_prune_near_duplicates
+    after delete on smart_documents.documents
+    for each row
+    execute function smart_documents.prune_near_duplicate_references();
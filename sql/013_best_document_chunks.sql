@@ -0,0 +1,27 @@
+-- chunk ที่ใกล้คำค้นที่สุดของเอกสารที่ระบุ (ใช้โดย backend=index ใน src/documents/search.py)
+-- เลือกในฐานข้อมูลเพื่อไม่ต้องส่ง embedding ของทุก chunk กลับมาทาง REST
+
+create or replace function smart_documents.best_document_chunks(
+    doc_ids bigint[],
+    query_embedding vector(1024)
+)
+returns table (
+    document_id bigint,
+    chunk_index int,
+    content text,
+    char_offset int,
+    similarity float
+)
+language sql stable
+as $$
+    select distinct on (c.document_id)
+        c.document_id,
+        c.chunk_index,
+        c.content,
+        c.char_offset,
+        1 - (c.embedding <=> query_embedding) as similarity
+    from smart_documents.document_chunks c
+    where c.document_id = any(doc_ids)
+      and c.embedding is not null
+    order by c.document_id, c.embedding <=> query_embedding;
+$$;
@@ -0,0 +1,47 @@
+-- เลือก HNSW index ของ document_chunks.embedding ให้ตรงกับ SEARCH_QUANTIZATION
+-- มีเพียง index ของโหมดที่ใช้ เพื่อไม่ให้พื้นที่และหน่วยความจำเพิ่มจากการเก็บหลาย index
+--   'none'    = index เต็มความละเอียด (document_chunks_embedding_idx จาก sql/001)
+--   'binary'  = index ของ binary_quantize (เล็กกว่า float32 32 เท่า)
+--   'halfvec' = index ของ halfvec (เล็กกว่า float32 2 เท่า)
+-- ขั้นที่สองของโหมด quantize คำนวณคะแนนจาก embedding เต็มเฉพาะ candidate (ไม่ใช้ index)
+-- คำค้นที่ส่ง quantization คนละโหมดกับ index ที่มีอยู่จะยังทำงานได้ แต่ต้อง scan ทั้งตาราง
+--
+-- ใช้งาน: select smart_documents.configure_chunk_vector_indexes('binary');
+
+drop index if exists smart_documents.document_chunks_embedding_binary_idx;
+drop index if exists smart_documents.document_chunks_embedding_halfvec_idx;
+
+create or replace function smart_documents.configure_chunk_vector_indexes(mode text default 'none')
+returns void
+language plpgsql
+as $$
+begin
+    if mode not in ('none', 'binary', 'halfvec') then
+        raise exception 'unknown quantization mode: %', mode;
+    end if;
+
+    if mode = 'binary' then
+        create index if not exists document_chunks_embedding_binary_idx
+            on smart_documents.document_chunks
+            using hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops);
+    else
+        drop index if exists smart_documents.document_chunks_embedding_binary_idx;
+    end if;
+
+    if mode = 'halfvec' then
+        create index if not exists document_chunks_embedding_halfvec_idx
+            on smart_documents.document_chunks
+            using hnsw ((embedding::halfvec(1024)) halfvec_cosine_ops);
+    else
+        drop index if exists smart_documents.document_chunks_embedding_halfvec_idx;
+    end if;
+
+    if mode = 'none' then
+        create index if not exists document_chunks_embedding_idx
+            on smart_documents.document_chunks
+            using hnsw (embedding vector_cosine_ops);
+    else
+        drop index if exists smart_documents.document_chunks_embedding_idx;
+    end if;
+end;
+$$;
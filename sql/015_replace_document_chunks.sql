@@ -0,0 +1,29 @@
+-- แทนที่ chunk ทั้งหมดของเอกสารใน transaction เดียว (ใช้โดย save_document_chunks ใน src/documents/documents_utils.py)
+-- ล็อกแถวของเอกสารก่อน เพื่อให้การแทนที่ของเอกสารเดียวกันทำทีละรายการ (ไม่ชน unique (document_id, chunk_index))
+-- chunks: [{"chunk_index": 0, "content": "...", "char_offset": 0, "heading": "...", "embedding": [0.1, ...]}, ...]
+
+create or replace function smart_documents.replace_document_chunks(doc_id bigint, chunks jsonb)
+returns int
+language plpgsql
+as $$
+declare
+    inserted int;
+begin
+    perform 1 from smart_documents.documents d where d.id = doc_id for update;
+
+    delete from smart_documents.document_chunks c where c.document_id = doc_id;
+
+    insert into smart_documents.document_chunks (document_id, chunk_index, content, char_offset, heading, embedding)
+    select
+        doc_id,
+        (item ->> 'chunk_index')::int,
+        item ->> 'content',
+        (item ->> 'char_offset')::int,
+        item ->> 'heading',
+        (item ->> 'embedding')::vector
+    from jsonb_array_elements(coalesce(chunks, '[]'::jsonb)) as item;
+
+    get diagnostics inserted = row_count;
+    return inserted;
+end;
+$$;
@@ -0,0 +1,95 @@
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+from datetime import datetime
+import base64
+import json
+import os
+
+load_dotenv()
+
+# ลำดับที่รองรับการแบ่งหน้าแบบ cursor: "id" หรือ "last_updated" (last_updated, id)
+CURSOR_ORDERS = ("id", "last_updated")
+
+# วิธีนับจำนวนทั้งหมดสำหรับ header X-Total-Count ของแต่ละ endpoint (PostgREST count=...)
+# exact = count(*) จริง, planned = ค่าประมาณจาก query planner (ไม่ scan), estimated = exact ถ้าน้อย ไม่เช่นนั้น planned
+# "none" = ไม่นับ
+DOCUMENTS_COUNT = os.getenv("DOCUMENTS_COUNT", "planned")
+CATEGORIES_COUNT = os.getenv("CATEGORIES_COUNT", "exact")
+USERS_COUNT = os.getenv("USERS_COUNT", "exact")
+
+
+def count_method(count: str) -> str | None:
+    """ค่าที่ส่งให้ select(..., count=...) ของ supabase (None = ไม่นับ)"""
+    return None if count == "none" else count
+
+
+def set_total_count(response, result):
+    """ใส่ header X-Total-Count จากผลลัพธ์ที่ขอ count ไว้"""
+    if getattr(result, "count", None) is not None:
+        response.headers["X-Total-Count"] = str(result.count)
+
+
+def encode_cursor(order: str, row: dict) -> str:
+    """สร้าง cursor (base64) จากแถวสุดท้ายของหน้า"""
+    values = {"o": order, "id": row["id"]}
+    if order == "last_updated":
+        values["t"] = row.get("last_updated")
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> dict:
+    """
+    ถอด cursor และตรวจชนิดของค่า เพราะค่าเหล่านี้ถูกนำไปสร้าง filter ของ PostgREST
+    id ต้องเป็นจำนวนเต็ม และ t ต้องเป็น None หรือเวลาแบบ ISO
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if values["o"] != order or type(values["id"]) is not int:
+            raise ValueError(order)
+        if order == "last_updated":
+            last_updated = values.get("t")
+            if last_updated is not None:
+                values["t"] = datetime.fromisoformat(last_updated).isoformat()
+        return values
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor ไม่ถูกต้อง")
+
+
+def paginate(query, limit: int, offset: int = 0, cursor: str | None = None, order: str = "id"):
+    """
+    เรียงลำดับและแบ่งหน้า query ของ PostgREST
+    - มี cursor: keyset (ค่าของแถวสุดท้าย < แถวถัดไป) ไม่ต้องข้ามแถวเหมือน offset
+    - ไม่มี cursor: offset เหมือนเดิม แต่เรียงลำดับคงที่
+    """
+    if order == "last_updated":
+        # Postgres เรียง null ไว้ท้ายสุดเมื่อเรียงจากน้อยไปมาก
+        query = query.order("last_updated").order("id")
+    else:
+        query = query.order("id")
+    if not cursor:
+        return query.range(offset, offset + limit - 1)
+
+    values = decode_cursor(cursor, order)
+    last_id = values["id"]
+    if order == "last_updated":
+        last_updated = values.get("t")
+        if last_updated is None:
+            query = query.is_("last_updated", "null").gt("id", last_id)
+        else:
+            query = query.or_(
+                f'last_updated.gt."{last_updated}",'
+                f'and(last_updated.eq."{last_updated}",id.gt."{last_id}"),'
+                "last_updated.is.null"
+            )
+    else:
+        query = query.gt("id", last_id)
+    return query.limit(limit)
+
+
+def next_cursor(rows: list[dict], limit: int, order: str = "id") -> str | None:
+    """cursor ของหน้าถัดไป (None ถ้าเป็นหน้าสุดท้าย)"""
+    if len(rows) < limit or not rows:
+        return None
+    return encode_cursor(order, rows[-1])
@@ -0,0 +1,42 @@
+from dotenv import load_dotenv
+import os
+from ..database.supabase import supabase
+from .ttl_cache import TTLCache
+
+load_dotenv()
+
+# จำนวนแผนกที่เก็บรายชื่อหมวดหมู่ไว้ใน cache
+CATEGORY_CACHE_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE", "256"))
+# อายุของ cache (วินาที) กันข้อมูลค้างกรณีแก้ตาราง categories โดยไม่ผ่าน API
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", "300"))
+
+department_categories_cache = TTLCache(CATEGORY_CACHE_SIZE, CATEGORY_CACHE_TTL)
+category_cache_invalidations = 0
+
+
+def department_categories(department: str) -> list[str]:
+    """ชื่อหมวดหมู่ทั้งหมดของแผนก (ใช้ cache ก่อนดึงจากตาราง categories)"""
+    names = department_categories_cache.get(department)
+    if names is None:
+        data = (
+            supabase.schema("smart_documents")
+            .table("categories")
+            .select("name")
+            .eq("department", department)
+            .execute()
+            .data
+        )
+        names = [cat["name"] for cat in data]
+        department_categories_cache.set(department, names)
+    return list(names)
+
+
+def invalidate_department_categories():
+    """ล้าง cache หลังสร้าง/แก้ไข/ลบหมวดหมู่ (หมวดหมู่อาจย้ายแผนกได้ จึงล้างทั้งหมด)"""
+    global category_cache_invalidations
+    category_cache_invalidations += 1
+    department_categories_cache.clear()
+
+
+def category_cache_stats() -> dict:
+    return {**department_categories_cache.stats(), "invalidations": category_cache_invalidations}
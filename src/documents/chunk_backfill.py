@@ -0,0 +1,76 @@
+"""
+สร้าง chunk ให้เอกสารที่ยังไม่มี chunk (เอกสารที่สร้างก่อนมีตาราง document_chunks)
+การค้นหาใช้ตาราง document_chunks เอกสารที่ยังไม่มี chunk จึงค้นหาไม่เจอจนกว่าจะ backfill
+
+ใช้งานผ่าน CLI:
+    python -m src.documents.chunk_backfill --batch-size 32 --concurrency 4
+หรือทำอัตโนมัติตอนเริ่ม server (CHUNK_BACKFILL_ON_STARTUP=true)
+"""
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import os
+from ..database.supabase import supabase
+from .documents_utils import prepare_document_chunks, save_document_chunks
+from .search_cache import corpus_version
+
+load_dotenv()
+
+# สร้าง chunk ให้เอกสารที่ยังไม่มี chunk เป็นงานเบื้องหลังตอนเริ่ม server
+CHUNK_BACKFILL_ON_STARTUP = os.getenv("CHUNK_BACKFILL_ON_STARTUP", "true").lower() == "true"
+
+
+def fetch_documents_without_chunks(after_id: int, limit: int) -> list[dict]:
+    """ดึงเอกสารที่ยังไม่มี chunk แบบ keyset (sql/010_document_chunks_backfill.sql)"""
+    return (
+        supabase.schema("smart_documents")
+        .rpc("documents_without_chunks", {"after_id": after_id, "page_size": limit})
+        .execute()
+        .data
+    )
+
+
+async def _backfill_document(doc: dict, semaphore: asyncio.Semaphore) -> int | None:
+    """สร้าง chunk ของเอกสารเดียว คืนค่าจำนวน chunk (None = ไม่สำเร็จ ให้เอกสารอื่นทำต่อได้)"""
+    async with semaphore:
+        try:
+            rows = await prepare_document_chunks(doc["id"], doc["data"] or "")
+            await asyncio.to_thread(save_document_chunks, doc["id"], rows)
+            return len(rows)
+        except Exception as e:
+            print(f"❌ Error backfilling chunks of document {doc['id']}: {e}")
+            return None
+
+
+async def backfill_document_chunks(batch_size: int = 32, concurrency: int = 4) -> dict:
+    """
+    สร้าง chunk ให้เอกสารที่ยังไม่มี chunk ทีละหน้า (หยุดกลางทางแล้วรันใหม่ได้ เพราะเลือกเฉพาะเอกสารที่ยังไม่มี chunk)
+    ข้ามเอกสาร pending ที่ worker จะสร้าง chunk ให้ และเอกสารที่ล้มเหลวจะถูกลองใหม่ในการรันครั้งถัดไป
+    คืนค่าจำนวนเอกสารและ chunk ที่สร้าง และจำนวนเอกสารที่ล้มเหลว
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    last_id = 0
+    documents = 0
+    chunks = 0
+    failed = 0
+    while True:
+        page = await asyncio.to_thread(fetch_documents_without_chunks, last_id, max(1, batch_size))
+        if not page:
+            break
+        counts = await asyncio.gather(*(_backfill_document(doc, semaphore) for doc in page))
+        corpus_version.bump("chunk_backfill")
+        last_id = page[-1]["id"]
+        done = [count for count in counts if count is not None]
+        documents += len(done)
+        chunks += sum(done)
+        failed += len(counts) - len(done)
+        print(f"Backfilled chunks for {documents} documents, {failed} failed (last id {last_id})")
+    return {"documents": documents, "chunks": chunks, "failed": failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create chunks for documents that have none")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    print(asyncio.run(backfill_document_chunks(args.batch_size, args.concurrency)))
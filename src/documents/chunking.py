@@ -0,0 +1,139 @@
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ขนาดสูงสุดของแต่ละ chunk และจำนวนตัวอักษรที่ซ้อนทับกับ chunk ก่อนหน้า
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1200"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "200"))
+
+HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s{0,3}(```|~~~)")
+
+
+def _split_blocks(text: str) -> list[dict]:
+    """
+    แยก markdown เป็น block ตามย่อหน้า (บรรทัดว่าง) และหัวข้อ
+    โดยไม่ตัด code block ออกจากกัน
+    คืนค่ารายการ {"start", "end", "heading", "is_heading"}
+    """
+    blocks = []
+    heading = None
+    in_fence = False
+    block_start = None
+    position = 0
+
+    def close_block(end):
+        nonlocal block_start
+        if block_start is not None and text[block_start:end].strip():
+            blocks.append({"start": block_start, "end": end, "heading": heading, "is_heading": False})
+        block_start = None
+
+    for line in text.splitlines(keepends=True):
+        line_start = position
+        position += len(line)
+
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            if block_start is None:
+                block_start = line_start
+            continue
+        if in_fence:
+            continue
+
+        heading_match = HEADING_PATTERN.match(line)
+        if heading_match:
+            close_block(line_start)
+            heading = heading_match.group(1)
+            blocks.append({"start": line_start, "end": position, "heading": heading, "is_heading": True})
+        elif not line.strip():
+            close_block(line_start)
+        elif block_start is None:
+            block_start = line_start
+
+    close_block(position)
+    return blocks
+
+
+def _overlap_start(text: str, lower: int, end: int, overlap: int) -> int:
+    """ตำแหน่งเริ่มของส่วนซ้อนทับ (overlap ตัวอักษรท้ายสุดก่อน end) โดยเริ่มที่ต้นคำถ้าทำได้"""
+    start = max(lower, end - overlap)
+    if start >= end or start == lower or text[start - 1].isspace():
+        return start
+    match = re.search(r"\s", text[start:end])
+    return start + match.end() if match else start
+
+
+def chunk_markdown(text: str, max_chars: int = CHUNK_MAX_CHARS, overlap: int = CHUNK_OVERLAP_CHARS) -> list[dict]:
+    """
+    แบ่ง markdown เป็น chunk ที่รู้จักหัวข้อและย่อหน้า
+    - แต่ละ chunk เริ่มเนื้อหาที่ขอบ block (ย่อหน้า/หัวข้อ) และรวม block ทั้งก้อนได้ไม่เกิน max_chars
+    - ส่วนท้ายของ chunk ก่อนหน้าใน section เดียวกัน (ไม่เกิน overlap ตัวอักษร) ถูกใส่ไว้หน้า chunk ถัดไป
+      (ความยาวรวมจึงอาจถึง max_chars + overlap)
+    - ตัดแบบความยาวคงที่เฉพาะ block ที่ยาวเกิน max_chars เอง
+    คืนค่ารายการ {"chunk_index", "content", "char_offset", "heading"}
+    โดย content คือ text[char_offset:char_offset + len(content)] ของเอกสารต้นฉบับ
+    """
+    max_chars = max(1, max_chars)
+    overlap = max(0, min(overlap, max_chars // 2))
+    spans = []
+
+    # จัดกลุ่ม block ตาม section (หัวข้อใหม่เริ่ม section ใหม่)
+    sections = []
+    for block in _split_blocks(text):
+        if block["is_heading"] or not sections:
+            sections.append({"heading": block["heading"], "blocks": []})
+        sections[-1]["blocks"].append(block)
+
+    for section in sections:
+        heading = section["heading"]
+        # chunk_start รวมส่วนซ้อนทับ, body_start คือขอบ block แรกของเนื้อหาใหม่
+        chunk_start = body_start = end = None
+        has_body = False
+        for block in section["blocks"]:
+            if body_start is not None and block["end"] - body_start <= max_chars:
+                end = block["end"]
+                has_body = has_body or not block["is_heading"]
+                continue
+            if body_start is None:
+                chunk_start = body_start = block["start"]
+            elif has_body:
+                spans.append((chunk_start, end, heading))
+                chunk_start = _overlap_start(text, body_start, end, overlap)
+                body_start = block["start"]
+            # ถ้ามีแต่หัวข้อ ไม่แยกหัวข้อออกเป็น chunk เดี่ยว ให้ติดไปกับเนื้อหาถัดไป
+            # block ที่ยาวเกินขนาด chunk ให้ตัดแบบความยาวคงที่
+            while block["end"] - body_start > max_chars:
+                cut = body_start + max_chars
+                spans.append((chunk_start, cut, heading))
+                chunk_start = _overlap_start(text, body_start, cut, overlap)
+                body_start = cut
+            end = block["end"]
+            has_body = has_body or not block["is_heading"]
+        if body_start is not None and end > body_start:
+            spans.append((chunk_start, end, heading))
+
+    chunks = []
+    for start, end, heading in spans:
+        content = text[start:end]
+        if not content.strip():
+            continue
+        chunks.append(
+            {
+                "chunk_index": len(chunks),
+                "content": content,
+                "char_offset": start,
+                "heading": heading,
+            }
+        )
+    return chunks
+
+
+def chunk_embedding_text(chunk: dict) -> str:
+    """ข้อความที่ใช้สร้าง embedding ของ chunk (เติมหัวข้อถ้า chunk ไม่ได้ขึ้นต้นด้วยหัวข้อ)"""
+    heading = chunk.get("heading")
+    content = chunk["content"]
+    if heading and heading not in content[: len(heading) + 10]:
+        return f"{heading}\n{content}"
+    return content
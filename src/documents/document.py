@@ -1,36 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from ..auth.auth_utils import get_current_user, is_admin
+from ..auth.auth_utils import get_current_user, is_admin, is_superadmin
 from ..database.supabase import supabase
+from ..database.pagination import (
+    CATEGORIES_COUNT,
+    DOCUMENTS_COUNT,
+    count_method,
+    next_cursor,
+    paginate,
+    set_total_count,
+)
 from .model import (
     DocumentCreate,
     DocumentUpdate,
     DocumentResponse,
+    DocumentSummary,
     CategoryCreate,
     CategoryUpdate,
     CategoryResponse,
     DocumentPayload,
     ImageReference,
+    SearchBatchRequest,
+)
+from .documents_utils import (
+    process_document_images,
+    delete_document_images,
+    embed_document,
+    replace_document_chunks,
+)
+from .embeding import embedding_stats
+from .embedding_jobs import (
+    EMBEDDING_ASYNC_WRITES,
+    STATUS_PENDING,
+    STATUS_READY,
+    embedding_jobs,
+    requeue_unfinished_documents,
 )
-from .documents_utils import process_document_images, delete_document_images
-from .embeding import get_embedding
-from typing import List, Dict, Optional
+from .category_cache import category_cache_stats, invalidate_department_categories
+from .duplicates import DUPLICATE_CHECK_MODE, DUPLICATE_THRESHOLD, duplicate_report, find_near_duplicates
+from .reembed import reembed_documents, reembed_progress
+from .search import (
+    SEARCH_BACKEND,
+    SEARCH_DIVERSITY,
+    SEARCH_MODE,
+    SEARCH_QUANTIZATION,
+    SEARCH_RESCORE_FACTOR,
+    cached_search,
+    cached_search_many,
+    cached_related,
+    format_stream_event,
+    parse_fields,
+    shape_results,
+    stream_results,
+)
+from .search_cache import corpus_version, search_cache_stats
+from .vector_index import vector_index, load_vector_index
+from typing import List, Dict, Optional, Literal
+import asyncio
 
 router = APIRouter()
 category_router = APIRouter()
 public_router = APIRouter()
+admin_router = APIRouter()
+
+# คอลัมน์ที่ใช้สร้าง DocumentResponse (ไม่ดึงคอลัมน์ embedding กลับมา)
+DOCUMENT_COLUMNS = ",".join(DocumentResponse.model_fields)
+# คอลัมน์ของรายการเอกสาร (ไม่ดึงเนื้อหาเต็ม เว้นแต่ขอด้วย include=data)
+DOCUMENT_SUMMARY_COLUMNS = ",".join(field for field in DocumentResponse.model_fields if field != "data")
 
+# งาน re-embed ที่กำลังทำงานอยู่ (มีได้ครั้งละหนึ่งงาน)
+reembed_task: asyncio.Task | None = None
 
-@router.get("/", response_model=list[DocumentResponse])
+
+@router.get("/", response_model=list[DocumentSummary], response_model_exclude_unset=True)
 async def list_documents(
+    response: Response,
     q: str | None = Query(None),
     category_name: str | None = Query(None),
     department: str | None = Query(None),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="cursor จาก header X-Next-Cursor ของหน้าก่อน (ใช้แทน offset)"),
+    order: Literal["id", "last_updated"] = "id",
+    search_mode: Literal["title", "fulltext", "trigram"] = Query(
+        "title", description="วิธีค้นหาด้วย q: title = ชื่อเอกสาร, fulltext = ทั้งชื่อและเนื้อหา, trigram = บางส่วนของคำ (ภาษาไทย)"
+    ),
+    include: str | None = Query(None, description="ข้อมูลเพิ่มเติมที่ต้องการ เช่น include=data (เนื้อหาเต็ม)"),
+    count: Literal["none", "exact", "planned", "estimated"] = Query(
+        DOCUMENTS_COUNT, description="วิธีนับจำนวนทั้งหมดใน header X-Total-Count"
+    ),
     current_user: dict = Depends(get_current_user),
 ):
     try:
+        include_fields = parse_fields(include) or []
+        columns = DOCUMENT_COLUMNS if "data" in include_fields else DOCUMENT_SUMMARY_COLUMNS
+
         # ถ้าไม่ได้ส่ง department มา ให้ใช้ department ของ user ปัจจุบัน
         
         if department is None or department == "":
@@ -41,9 +106,6 @@ async def list_documents(
         print(f"Debug - current_user: {current_user}")
         print(f"Debug - current_user.get('department'): {current_user.get('department')}")
 
-        query = supabase.schema("smart_documents").table("documents").select("*")
-        if category_name:
-            query = query.eq("category_name", category_name)
         # ถ้า department เป็น "*" ให้ดึงทุกแผนก จึงไม่ต้องเพิ่มเงื่อนไข
         if current_user["role"] in ["superadmin"]:
             department="*"
@@ -53,21 +115,60 @@ async def list_documents(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="ไม่มีสิทธิ์ในการดึงเอกสารทั้งหมด",
             )
-        
+
+        ranked = bool(q) and search_mode != "title"
+        if ranked and cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ผลการค้นหาแบบเรียงตามความเกี่ยวข้องใช้ได้เฉพาะ offset",
+            )
+
+        if ranked:
+            # ค้นหาด้วย index ของชื่อและเนื้อหา เรียงตามความเกี่ยวข้อง (sql/009_document_list_search.sql)
+            # ฟังก์ชันถูก inline จึงใช้ filter, select และ range ด้านล่างภายใน query เดียวกับ index
+            query = (
+                supabase.schema("smart_documents")
+                .rpc(
+                    f"search_documents_{search_mode}",
+                    {"query_text": q},
+                    # planner ประมาณจำนวนแถวของฟังก์ชันไม่ได้ จึงนับจริงเสมอ (ผลลัพธ์ถูกกรองด้วย index แล้ว)
+                    count=count_method("none" if count == "none" else "exact"),
+                )
+                .select(columns)
+            )
+        elif department and department != "*":
+            # กรองตามแผนกด้วย view ที่ join categories ไว้แล้ว (sql/008_documents_with_department.sql)
+            # จึงไม่ต้องดึงรายชื่อหมวดหมู่ของแผนกก่อน
+            query = (
+                supabase.schema("smart_documents")
+                .table("documents_with_department")
+                .select(columns, count=count_method(count))
+            )
+        else:
+            query = (
+                supabase.schema("smart_documents")
+                .table("documents")
+                .select(columns, count=count_method(count))
+            )
         if department and department != "*":
-            # ดึงข้อมูล categories ที่อยู่ใน department ที่ระบุ
-            categories_in_dept = supabase.schema("smart_documents").table("categories").select("name").eq("department", department).execute().data
-            category_names = [cat["name"] for cat in categories_in_dept]
-            if category_names:
-                query = query.in_("category_name", category_names)
-            else:
-                # ถ้าไม่มี categories ใน department ที่ระบุ ให้คืนค่าว่าง
-                return []
-        if q:
-            query = query.ilike("title", f"%{q}%")
-
-        data = query.range(offset, offset + limit - 1).execute().data
-        return [DocumentResponse(**item) for item in data]
+            query = query.eq("department", department)
+        if category_name:
+            query = query.eq("category_name", category_name)
+
+        if ranked:
+            result = query.range(offset, offset + limit - 1).execute()
+            data = result.data
+            response.headers["X-Next-Cursor"] = ""
+        else:
+            if q:
+                query = query.ilike("title", f"%{q}%")
+            result = paginate(query, limit, offset, cursor, order).execute()
+            data = result.data
+            response.headers["X-Next-Cursor"] = next_cursor(data, limit, order) or ""
+        set_total_count(response, result)
+        return [DocumentSummary(**item) for item in data]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -81,7 +182,7 @@ async def get_document(doc_id: int, current_user: dict = Depends(get_current_use
         data = (
             supabase.schema("smart_documents")
             .table("documents")
-            .select("*")
+            .select(DOCUMENT_COLUMNS)
             .eq("id", doc_id)
             .execute()
             .data
@@ -100,10 +201,89 @@ async def get_document(doc_id: int, current_user: dict = Depends(get_current_use
         )
 
 
+def load_document_embedding(doc_id: int) -> list[float]:
+    """embedding ที่บันทึกไว้ของเอกสาร (404 ถ้าไม่พบเอกสาร, 409 ถ้ายังไม่มี embedding)"""
+    data = (
+        supabase.schema("smart_documents")
+        .table("documents")
+        .select("id,embedding")
+        .eq("id", doc_id)
+        .execute()
+        .data
+    )
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ไม่พบเอกสาร")
+    if data[0].get("embedding") is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="เอกสารนี้ยังไม่มี embedding กรุณาลองใหม่ภายหลัง",
+        )
+    return data[0]["embedding"]
+
+
+@router.get("/{doc_id}/related", response_model=List[Dict])
+async def get_related_documents(
+    doc_id: int,
+    match_count: int = Query(5, ge=1, le=50),
+    match_threshold: float = 0.5,
+    filter_category: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    department: Optional[str] = None,
+    backend: Literal["rpc", "index"] = SEARCH_BACKEND,
+    fields: Optional[str] = Query(None, description="ฟิลด์ที่ต้องการ คั่นด้วย comma เช่น id,title,score"),
+    current_user: dict = Depends(get_current_user),
+):
+    """เอกสารที่เนื้อหาใกล้เคียงกับเอกสารนี้ โดยใช้ embedding ที่บันทึกไว้ (ไม่สร้าง embedding ใหม่)"""
+    try:
+        field_list = parse_fields(fields)
+        data = await cached_related(
+            doc_id,
+            load_document_embedding,
+            backend=backend,
+            match_count=match_count,
+            match_threshold=match_threshold,
+            filter_category=filter_category,
+            filter_categories=categories or None,
+            filter_department=department,
+            with_content=field_list is None or "content" in field_list,
+        )
+        return shape_results(data, "", field_list)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"เกิดข้อผิดพลาดในการค้นหาเอกสารที่เกี่ยวข้อง: {str(e)}",
+        )
+
+
+def discard_document(doc_id: int):
+    """ลบเอกสารที่สร้างไม่สำเร็จ เพื่อไม่ให้เหลือแถว pending ที่ไม่มี embedding และไม่มีใครเพิ่มกลับเข้าคิว"""
+    try:
+        delete_document_images(doc_id)
+        supabase.schema("smart_documents").table("documents").delete().eq("id", doc_id).execute()
+    except Exception as e:
+        print(f"❌ Error discarding document {doc_id}: {e}")
+
+
+async def reject_near_duplicates(content: str, exclude_id: int | None = None, title: str | None = None):
+    """ตอบกลับ 409 พร้อมรายการเอกสารที่เกือบซ้ำ ถ้าเนื้อหาใหม่ใกล้เคียงเอกสารที่มีอยู่เกิน threshold"""
+    embedding = await embed_document(content, exclude_id, title)
+    near_duplicates = await asyncio.to_thread(find_near_duplicates, embedding, exclude_id)
+    if near_duplicates:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "พบเอกสารที่มีเนื้อหาเกือบซ้ำ", "near_duplicates": near_duplicates},
+        )
+
+
 @router.post("/", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
 async def create_document(
-    payload: DocumentPayload, current_user: dict = Depends(is_admin)
+    payload: DocumentPayload,
+    duplicates: Literal["off", "warn", "reject"] = DUPLICATE_CHECK_MODE,
+    current_user: dict = Depends(is_admin),
 ):
+    doc_id = None
     try:
         # ดึงข้อมูลจาก payload
         doc_data = payload.docData
@@ -126,13 +306,17 @@ async def create_document(
                     detail=f"ไม่พบหมวดหมู่ '{category_name}' ในตาราง categories",
                 )
 
+        # duplicates=reject ต้องรู้ผลก่อนบันทึก จึงสร้าง embedding ทันทีแม้จะเปิดโหมดเบื้องหลัง
+        if duplicates == "reject":
+            await reject_near_duplicates(doc_data.content, title=doc_data.title)
+
         insert_data = {
             "title": doc_data.title,
             "category_name": doc_data.category,
             "data": "",  # ใช้ content ว่างไปก่อน
             "created_by": current_user["full_name"],
             "created_by_id": current_user["id"],
-            "embedding": get_embedding(doc_data.content),
+            "embedding_status": STATUS_PENDING,
         }
 
         result = (
@@ -152,8 +336,16 @@ async def create_document(
         # อัปเดตเอกสารด้วย content ที่มีรูปภาพแล้ว
         update_data = {
             "data": updated_content,
-            "embedding": get_embedding(updated_content),
         }
+        if not EMBEDDING_ASYNC_WRITES:
+            update_data["embedding"] = await embed_document(updated_content, doc_id, doc_data.title)
+            update_data["embedding_status"] = STATUS_READY
+            # ไม่ตรวจ (duplicates=off) ให้ล้างผลเดิม ไม่เช่นนั้นผลของเนื้อหาเก่าจะค้างอยู่
+            update_data["near_duplicates"] = (
+                await asyncio.to_thread(find_near_duplicates, update_data["embedding"], doc_id)
+                if duplicates != "off"
+                else None
+            )
 
         updated_result = (
             supabase.schema("smart_documents")
@@ -164,10 +356,23 @@ async def create_document(
             .data
         )
 
+        vector_index.set_metadata(doc_id, doc_data.title, doc_data.category)
+        if EMBEDDING_ASYNC_WRITES:
+            # สร้าง embedding และ chunk เบื้องหลัง แล้วตอบกลับทันที
+            embedding_jobs.enqueue(doc_id, updated_content, check_duplicates=duplicates != "off")
+        else:
+            # แบ่งเอกสารเป็น chunk สำหรับการค้นหา
+            await replace_document_chunks(doc_id, updated_content)
+            vector_index.upsert(doc_id, update_data["embedding"])
+        corpus_version.bump(f"document {doc_id}")
+
         return DocumentResponse(**updated_result[0])
     except HTTPException:
         raise
     except Exception as e:
+        # เพิ่มแถวไปแล้วแต่ทำต่อไม่สำเร็จ (เช่นสร้าง embedding ไม่ได้) ให้ลบทิ้ง เพราะตอบกลับว่าสร้างไม่สำเร็จ
+        if doc_id is not None:
+            await asyncio.to_thread(discard_document, doc_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"เกิดข้อผิดพลาดในการสร้างเอกสาร: {str(e)}",
@@ -176,14 +381,17 @@ async def create_document(
 
 @router.put("/{doc_id}", response_model=DocumentResponse)
 async def update_document(
-    doc_id: int, payload: DocumentPayload, current_user: dict = Depends(is_admin)
+    doc_id: int,
+    payload: DocumentPayload,
+    duplicates: Literal["off", "warn", "reject"] = DUPLICATE_CHECK_MODE,
+    current_user: dict = Depends(is_admin),
 ):
     try:
         # ตรวจสอบว่ามีเอกสารนี้ในระบบหรือไม่
         existing = (
             supabase.schema("smart_documents")
             .table("documents")
-            .select("*")
+            .select("id")
             .eq("id", doc_id)
             .execute()
             .data
@@ -214,12 +422,14 @@ async def update_document(
                     detail=f"ไม่พบหมวดหมู่ '{category_name}' ในตาราง categories",
                 )
 
+        if duplicates == "reject":
+            await reject_near_duplicates(doc_data.content, doc_id, doc_data.title)
+
         # ประมวลผลรูปภาพและอัปเดต content
         updated_content = process_document_images(doc_data.content, img_refs, doc_id)
 
         # สร้างข้อมูลสำหรับ update
         update_data = {
-            "embedding": get_embedding(updated_content),
             "title": doc_data.title,
             "category_name": doc_data.category,
             "data": updated_content,
@@ -227,6 +437,19 @@ async def update_document(
             "updated_by": current_user["full_name"],
             "updated_by_id": current_user["id"],
         }
+        if EMBEDDING_ASYNC_WRITES:
+            update_data["embedding_status"] = STATUS_PENDING
+            # ผลเดิมเป็นของเนื้อหาเก่า worker จะบันทึกผลใหม่ถ้ามีการตรวจ
+            update_data["near_duplicates"] = None
+        else:
+            update_data["embedding"] = await embed_document(updated_content, doc_id, doc_data.title)
+            update_data["embedding_status"] = STATUS_READY
+            # ไม่ตรวจ (duplicates=off) ให้ล้างผลเดิม ไม่เช่นนั้นผลของเนื้อหาเก่าจะค้างอยู่
+            update_data["near_duplicates"] = (
+                await asyncio.to_thread(find_near_duplicates, update_data["embedding"], doc_id)
+                if duplicates != "off"
+                else None
+            )
 
         updated = (
             supabase.schema("smart_documents")
@@ -237,6 +460,16 @@ async def update_document(
             .data
         )
 
+        vector_index.set_metadata(doc_id, doc_data.title, doc_data.category)
+        if EMBEDDING_ASYNC_WRITES:
+            # สร้าง embedding และ chunk เบื้องหลัง แล้วตอบกลับทันที
+            embedding_jobs.enqueue(doc_id, updated_content, check_duplicates=duplicates != "off")
+        else:
+            # แบ่งเอกสารเป็น chunk สำหรับการค้นหา
+            await replace_document_chunks(doc_id, updated_content)
+            vector_index.upsert(doc_id, update_data["embedding"])
+        corpus_version.bump(f"document {doc_id}")
+
         return DocumentResponse(**updated[0])
     except HTTPException:
         raise
@@ -265,10 +498,13 @@ async def delete_document(doc_id: int, current_user: dict = Depends(is_admin)):
 
         # ลบรูปภาพที่เกี่ยวข้องกับเอกสาร
         delete_document_images(doc_id)
+        embedding_jobs.forget(doc_id)
+        vector_index.remove(doc_id)
 
         supabase.schema("smart_documents").table("documents").delete().eq(
             "id", doc_id
         ).execute()
+        corpus_version.bump(f"document {doc_id}")
         return {"message": "ลบเอกสารและรูปภาพที่เกี่ยวข้องสำเร็จ"}
     except HTTPException:
         raise
@@ -281,13 +517,18 @@ async def delete_document(doc_id: int, current_user: dict = Depends(is_admin)):
 
 @category_router.get("/", response_model=list[CategoryResponse])
 async def list_categories(
+    response: Response,
     department: str | None = Query(None),
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="cursor จาก header X-Next-Cursor ของหน้าก่อน (ใช้แทน offset)"),
+    count: Literal["none", "exact", "planned", "estimated"] = Query(
+        CATEGORIES_COUNT, description="วิธีนับจำนวนทั้งหมดใน header X-Total-Count"
+    ),
     current_user: dict = Depends(get_current_user),
 ):
     try:
-        query = supabase.schema("smart_documents").table("categories").select("*")
+        query = supabase.schema("smart_documents").table("categories").select("*", count=count_method(count))
 
         if current_user["role"] in ["admin","user"] and department == "*":
             raise HTTPException(
@@ -299,8 +540,13 @@ async def list_categories(
             query = query.eq("department", department)
         else:
             query = query.eq("department", current_user["department"])
-        data = query.range(offset, offset + limit - 1).execute().data
+        result = paginate(query, limit, offset, cursor).execute()
+        data = result.data
+        response.headers["X-Next-Cursor"] = next_cursor(data, limit) or ""
+        set_total_count(response, result)
         return [CategoryResponse(**item) for item in data]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -350,6 +596,8 @@ async def create_category(
             .execute()
             .data
         )
+        invalidate_department_categories()
+        corpus_version.bump(f"category {result[0]['id']}")
         return CategoryResponse(**result[0])
     except Exception as e:
         raise HTTPException(
@@ -386,6 +634,8 @@ async def update_category(
             .execute()
             .data
         )
+        invalidate_department_categories()
+        corpus_version.bump(f"category {cat_id}")
         return CategoryResponse(**updated[0])
     except HTTPException:
         raise
@@ -426,6 +676,8 @@ async def delete_category(cat_id: int, current_user: dict = Depends(is_admin)):
         supabase.schema("smart_documents").table("categories").delete().eq(
             "id", cat_id
         ).execute()
+        invalidate_department_categories()
+        corpus_version.bump(f"category {cat_id}")
         return {"message": "ลบหมวดหมู่สำเร็จ"}
     except HTTPException:
         raise
@@ -442,45 +694,146 @@ async def search_documents(
     match_count: int = 5,
     match_threshold: float = 0.5,
     filter_category: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None, description="กรองหลายหมวดหมู่ (ส่งซ้ำได้ เช่น categories=a&categories=b)"),
+    department: Optional[str] = None,
+    quantization: Literal["none", "binary", "halfvec"] = SEARCH_QUANTIZATION,
+    rescore_factor: int = Query(SEARCH_RESCORE_FACTOR, ge=1, le=20),
+    backend: Literal["rpc", "index"] = SEARCH_BACKEND,
+    mode: Literal["vector", "hybrid"] = SEARCH_MODE,
+    diversity: float = Query(SEARCH_DIVERSITY, ge=0.0, le=1.0, description="0 = ตามความเกี่ยวข้อง, มากขึ้น = ลดผลลัพธ์ที่ซ้ำกัน (MMR)"),
+    fields: Optional[str] = Query(None, description="ฟิลด์ที่ต้องการ คั่นด้วย comma เช่น id,title,score"),
+    snippet: bool = False,
+    snippet_length: int = Query(200, ge=20, le=2000),
+    highlight: bool = True,
 ) -> List[Dict]:
-    """ค้นหาเอกสารด้วย vector similarity"""
+    """
+    ค้นหาเอกสารด้วย vector similarity โดยคืนค่า chunk ที่ตรงที่สุดของแต่ละเอกสาร
+    mode=hybrid จะค้นหาด้วยคำ (trigram) ควบคู่ และรวมอันดับด้วย reciprocal rank fusion
+    diversity > 0 เลือกผลลัพธ์ด้วย maximal marginal relevance เพื่อลดเอกสารที่เนื้อหาซ้ำกัน
+    snippet=true คืนค่าเฉพาะช่วงข้อความรอบคำค้น (ยาวไม่เกิน snippet_length) เป็นข้อความที่ escape HTML แล้ว
+    highlight=true ครอบคำค้นด้วย <mark> (snippet_length ไม่นับแท็กและ entity ที่เพิ่มเข้ามา)
+    """
     try:
-        # สร้าง embedding จาก query
-        query_embedding = get_embedding(query)
-
-        # เรียกใช้ RPC function (ต้องสร้างใน schema smart_document)
-        result = (
-            supabase.schema("smart_documents")
-            .rpc(
-                "search_documents",
-                {
-                    "query_embedding": query_embedding,
-                    "match_count": match_count,
-                    "match_threshold": match_threshold,
-                    "filter_category": filter_category,
-                },
-            )
-            .execute()
+        field_list = parse_fields(fields)
+
+        # ใช้ผลลัพธ์จาก cache ถ้าข้อมูลยังไม่เปลี่ยน ไม่เช่นนั้นสร้าง embedding จาก query แล้วค้นหา
+        data, _ = await cached_search(
+            query,
+            mode=mode,
+            backend=backend,
+            match_count=match_count,
+            match_threshold=match_threshold,
+            filter_category=filter_category,
+            quantization=quantization,
+            rescore_factor=rescore_factor,
+            with_content=field_list is None or "content" in field_list,
+            filter_categories=categories,
+            filter_department=department,
+            diversity=diversity,
         )
-        print(result.data)
-        if result.data == []:
+        if data == []:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="ไม่พบเอกสารที่ตรงกับคำค้น",
             )
-        data = [
+        return shape_results(data, query, field_list, snippet, snippet_length, highlight)
+
+    except HTTPException:
+        # ส่งต่อ HTTPException (เช่น 404) โดยไม่แปลงเป็น 500
+        raise
+    except Exception as e:
+        print(f"❌ Error searching documents: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"เกิดข้อผิดพลาดในการค้นหาเอกสาร: {str(e)}",
+        )
+
+
+@public_router.post("/search/batch", response_model=List[Dict])
+async def search_documents_batch(payload: SearchBatchRequest) -> List[Dict]:
+    """
+    ค้นหาหลายคำค้นในครั้งเดียว: สร้าง embedding ของทุกคำค้นใน batch เดียวและค้นหาพร้อมกัน
+    คืนค่า [{"query", "results"}] ตามลำดับของ queries (คำค้นที่ไม่พบผลลัพธ์จะได้ results ว่าง)
+    """
+    try:
+        field_list = parse_fields(payload.fields)
+        grouped = await cached_search_many(
+            payload.queries,
+            mode=payload.mode or SEARCH_MODE,
+            backend=payload.backend or SEARCH_BACKEND,
+            match_count=payload.match_count,
+            match_threshold=payload.match_threshold,
+            filter_category=payload.filter_category,
+            quantization=payload.quantization or SEARCH_QUANTIZATION,
+            rescore_factor=payload.rescore_factor or SEARCH_RESCORE_FACTOR,
+            with_content=field_list is None or "content" in field_list,
+            filter_categories=payload.categories,
+            filter_department=payload.department,
+            diversity=SEARCH_DIVERSITY if payload.diversity is None else payload.diversity,
+        )
+        return [
             {
-                "title": item["title"],
-                "content": item["data"],
-                "category": item["category_name"],
-                "score": item["similarity"],
+                "query": query,
+                "results": shape_results(
+                    data, query, field_list, payload.snippet, payload.snippet_length, payload.highlight
+                ),
             }
-            for item in result.data
+            for query, data in zip(payload.queries, grouped)
         ]
-        return data
+    except Exception as e:
+        print(f"❌ Error searching documents: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"เกิดข้อผิดพลาดในการค้นหาเอกสาร: {str(e)}",
+        )
 
+
+@public_router.get("/search/stream")
+async def stream_search_documents(
+    query: str,
+    match_count: int = 5,
+    match_threshold: float = 0.5,
+    filter_category: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None),
+    department: Optional[str] = None,
+    quantization: Literal["none", "binary", "halfvec"] = SEARCH_QUANTIZATION,
+    rescore_factor: int = Query(SEARCH_RESCORE_FACTOR, ge=1, le=20),
+    backend: Literal["rpc", "index"] = SEARCH_BACKEND,
+    mode: Literal["vector", "hybrid"] = SEARCH_MODE,
+    diversity: float = Query(SEARCH_DIVERSITY, ge=0.0, le=1.0),
+    fields: Optional[str] = Query(None, description="ฟิลด์ที่ต้องการ คั่นด้วย comma เช่น id,title,score"),
+    snippet: bool = False,
+    snippet_length: int = Query(200, ge=20, le=2000),
+    highlight: bool = True,
+    format: Literal["ndjson", "sse"] = "ndjson",
+):
+    """
+    ค้นหาเหมือน /search แต่ส่งผลลัพธ์แบบ stream (NDJSON หรือ server-sent events)
+    ส่งเหตุการณ์ result (ข้อมูลย่อ) ของทุกผลลัพธ์ก่อน ตามด้วย content ของแต่ละผลลัพธ์ และ done
+    """
+    try:
+        field_list = parse_fields(fields)
+        # ยังไม่ดึง chunk ของ backend=index จนกว่าจะส่งข้อมูลย่อเสร็จ
+        data, query_embedding = await cached_search(
+            query,
+            mode=mode,
+            backend=backend,
+            match_count=match_count,
+            match_threshold=match_threshold,
+            filter_category=filter_category,
+            quantization=quantization,
+            rescore_factor=rescore_factor,
+            with_content=False,
+            filter_categories=categories,
+            filter_department=department,
+            diversity=diversity,
+        )
+        if data == []:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="ไม่พบเอกสารที่ตรงกับคำค้น",
+            )
     except HTTPException:
-        # ส่งต่อ HTTPException (เช่น 404) โดยไม่แปลงเป็น 500
         raise
     except Exception as e:
         print(f"❌ Error searching documents: {e}")
@@ -488,3 +841,129 @@ async def search_documents(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"เกิดข้อผิดพลาดในการค้นหาเอกสาร: {str(e)}",
         )
+
+    async def events():
+        try:
+            async for event, payload in stream_results(
+                data, query, query_embedding, field_list, snippet, snippet_length, highlight
+            ):
+                yield format_stream_event(event, payload, format)
+        except Exception as e:
+            # หลังเริ่มส่งแล้วเปลี่ยน status code ไม่ได้ จึงแจ้งข้อผิดพลาดเป็นเหตุการณ์
+            print(f"❌ Error streaming search results: {e}")
+            yield format_stream_event("error", {"detail": str(e)}, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@admin_router.get("/embedding/stats", response_model=dict)
+async def get_embedding_stats(current_user: dict = Depends(is_admin)):
+    """สถิติของ embedding batcher และ cache (hit/miss)"""
+    return embedding_stats()
+
+
+@admin_router.get("/search-cache", response_model=dict)
+async def get_search_cache_stats(current_user: dict = Depends(is_admin)):
+    """สถิติของ cache ผลการค้นหาและเวอร์ชันปัจจุบันของข้อมูล"""
+    return search_cache_stats()
+
+
+@admin_router.post("/search-cache/clear", response_model=dict)
+async def clear_search_cache(current_user: dict = Depends(is_admin)):
+    """ล้าง cache ผลการค้นหา (เช่นหลังแก้ข้อมูลในฐานข้อมูลโดยตรง)"""
+    return {"corpus_version": corpus_version.bump("manual")}
+
+
+@admin_router.get("/category-cache", response_model=dict)
+async def get_category_cache_stats(current_user: dict = Depends(is_admin)):
+    """สถิติของ cache รายชื่อหมวดหมู่ของแต่ละแผนก"""
+    return category_cache_stats()
+
+
+@admin_router.get("/embedding/queue", response_model=dict)
+async def get_embedding_queue(current_user: dict = Depends(is_admin)):
+    """ความยาวคิวและความล่าช้าของงานสร้าง embedding เบื้องหลัง"""
+    return embedding_jobs.stats()
+
+
+@admin_router.post("/embedding/requeue", response_model=dict)
+async def requeue_embeddings(current_user: dict = Depends(is_admin)):
+    """เพิ่มเอกสารที่สถานะ pending/failed กลับเข้าคิวสร้าง embedding"""
+    try:
+        return {"requeued": await requeue_unfinished_documents()}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"เกิดข้อผิดพลาดในการเพิ่มงานสร้าง embedding: {str(e)}",
+        )
+
+
+@admin_router.post("/embedding/reembed", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def start_reembed(
+    batch_size: int = Query(32, ge=1, le=256),
+    concurrency: int = Query(4, ge=1, le=32),
+    with_chunks: bool = Query(True),
+    restart: bool = Query(False),
+    current_user: dict = Depends(is_superadmin),
+):
+    """เริ่มสร้าง embedding ใหม่ให้เอกสารทั้งหมด (ทำต่อจาก checkpoint ถ้ามี)"""
+    global reembed_task
+    if reembed_task is not None and not reembed_task.done():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="มีงานสร้าง embedding ใหม่กำลังทำงานอยู่",
+        )
+    reembed_task = asyncio.create_task(
+        reembed_documents(
+            batch_size=batch_size,
+            concurrency=concurrency,
+            with_chunks=with_chunks,
+            restart=restart,
+        )
+    )
+    return {"message": "เริ่มสร้าง embedding ใหม่แล้ว"}
+
+
+@admin_router.get("/embedding/reembed", response_model=dict)
+async def get_reembed_progress(current_user: dict = Depends(is_superadmin)):
+    """ความคืบหน้าและอัตราการประมวลผลของงานสร้าง embedding ใหม่"""
+    progress = dict(reembed_progress)
+    if reembed_task is not None and reembed_task.done() and reembed_task.exception():
+        progress["error"] = str(reembed_task.exception())
+    return progress
+
+
+@admin_router.get("/duplicates", response_model=dict)
+async def get_duplicate_report(
+    threshold: float = Query(DUPLICATE_THRESHOLD, ge=0.5, le=1.0),
+    current_user: dict = Depends(is_admin),
+):
+    """กลุ่มเอกสารที่เนื้อหาเกือบซ้ำกันของทั้งตาราง documents"""
+    try:
+        return await asyncio.to_thread(duplicate_report, threshold)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"เกิดข้อผิดพลาดในการตรวจเอกสารซ้ำ: {str(e)}",
+        )
+
+
+@admin_router.get("/vector-index", response_model=dict)
+async def get_vector_index_stats(current_user: dict = Depends(is_admin)):
+    """สถานะของ index ในหน่วยความจำ"""
+    return vector_index.stats()
+
+
+@admin_router.post("/vector-index/rebuild", response_model=dict)
+async def rebuild_vector_index(current_user: dict = Depends(is_admin)):
+    """สร้าง index ในหน่วยความจำใหม่จาก documents.embedding"""
+    try:
+        documents = await asyncio.to_thread(load_vector_index)
+        corpus_version.bump("vector index rebuild")
+        return {"documents": documents}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"เกิดข้อผิดพลาดในการสร้าง index: {str(e)}",
+        )
@@ -1,8 +1,12 @@
+import asyncio
 import base64
 import uuid
 import re
 from ..database.supabase import supabase, supabase_admin
 from .model import ImageReference
+from .chunking import chunk_markdown, chunk_embedding_text
+from .embeding import aget_embedding, aget_embeddings
+from .text_normalizer import embedding_text, normalize_for_embedding, normalize_with_report
 
 def upload_image_to_supabase(img_byte: str, file_name: str, doc_id: int = None) -> str:
     """
@@ -148,4 +152,67 @@ def delete_document_images(doc_id: int) -> bool:
         return True
     except Exception as e:
         print(f"Error deleting images for document {doc_id}: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+async def embed_document(content: str, doc_id: int = None, title: str | None = None) -> list[float]:
+    """
+    normalize เนื้อหาเอกสาร (ลบลิงก์รูปภาพ, URL, code block ยาวๆ) แล้วสร้าง embedding
+    ถ้าไม่เหลือข้อความหลัง normalize ใช้ชื่อเอกสารหรือข้อความเดิมแทน
+    """
+    normalized, report = normalize_with_report(content)
+    print(
+        f"Embedding document {doc_id}: {report['chars_before']} -> {report['chars_after']} chars "
+        f"(saved ~{report['tokens_saved_estimate']} tokens)"
+    )
+    text = normalized or embedding_text(content, title)
+    if not text:
+        raise ValueError(f"document {doc_id} has no text to embed")
+    return await aget_embedding(text)
+
+
+async def prepare_document_chunks(doc_id: int, content: str) -> list[dict]:
+    """
+    แบ่งเอกสารเป็น chunk และสร้าง embedding แบบ batch
+    ข้าม chunk ที่ไม่มีข้อความเหลือหลัง normalize (embedding server ไม่รับข้อความว่าง)
+    คืนค่าแถวสำหรับบันทึกลงตาราง document_chunks
+    """
+    chunks = []
+    texts = []
+    for chunk in chunk_markdown(content):
+        text = normalize_for_embedding(chunk_embedding_text(chunk))
+        if text:
+            chunks.append(chunk)
+            texts.append(text)
+    embeddings = await aget_embeddings(texts) if texts else []
+    return [
+        {
+            "document_id": doc_id,
+            "chunk_index": chunk_index,
+            "content": chunk["content"],
+            "char_offset": chunk["char_offset"],
+            "heading": chunk["heading"],
+            "embedding": embedding,
+        }
+        for chunk_index, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+    ]
+
+
+def save_document_chunks(doc_id: int, rows: list[dict]):
+    """บันทึก chunk ของเอกสารแทนที่ chunk เดิมใน transaction เดียว (sql/015_replace_document_chunks.sql)"""
+    supabase.schema("smart_documents").rpc(
+        "replace_document_chunks",
+        {
+            "doc_id": doc_id,
+            "chunks": [{key: value for key, value in row.items() if key != "document_id"} for row in rows],
+        },
+    ).execute()
+
+
+async def replace_document_chunks(doc_id: int, content: str) -> int:
+    """
+    แบ่งเอกสารเป็น chunk สร้าง embedding แบบ batch แล้วบันทึกแทนที่ chunk เดิมในตาราง document_chunks
+    คืนค่าจำนวน chunk ที่บันทึก
+    """
+    rows = await prepare_document_chunks(doc_id, content)
+    await asyncio.to_thread(save_document_chunks, doc_id, rows)
+    return len(rows)
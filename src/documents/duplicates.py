@@ -0,0 +1,150 @@
+"""
+ตรวจหาเอกสารที่เนื้อหาเกือบซ้ำกัน
+
+- ตอนสร้าง/แก้ไขเอกสาร: find_near_duplicates() เทียบ embedding ใหม่กับเอกสารที่มีอยู่
+- รายงานทั้งตาราง: duplicate_clusters() คำนวณความคล้ายทีละ block แล้วรวมเป็นกลุ่ม
+
+ใช้งานผ่าน CLI:
+    python -m src.documents.duplicates --threshold 0.95
+หรือผ่าน GET /admin/duplicates
+"""
+from dotenv import load_dotenv
+import argparse
+import json
+import os
+import numpy as np
+from ..database.supabase import supabase
+from .vector_index import fetch_document_embeddings, vector_index
+from .vectors import parse_vector, to_matrix
+
+load_dotenv()
+
+# การตรวจเอกสารซ้ำตอนสร้าง/แก้ไข: "off" = ไม่ตรวจ, "warn" = บันทึกใน near_duplicates, "reject" = ตอบกลับ 409
+DUPLICATE_CHECK_MODE = os.getenv("DUPLICATE_CHECK_MODE", "warn")
+# cosine similarity ขั้นต่ำที่ถือว่าเป็นเอกสารเกือบซ้ำ
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.95"))
+# จำนวนเอกสารเกือบซ้ำสูงสุดที่รายงานต่อเอกสาร
+DUPLICATE_MAX_RESULTS = int(os.getenv("DUPLICATE_MAX_RESULTS", "5"))
+
+
+def find_near_duplicates(
+    embedding,
+    exclude_id: int | None = None,
+    threshold: float = DUPLICATE_THRESHOLD,
+    limit: int = DUPLICATE_MAX_RESULTS,
+) -> list[dict]:
+    """เอกสารที่ embedding ใกล้เคียงเกิน threshold (ใช้ index ในหน่วยความจำถ้ามี ไม่เช่นนั้นใช้ RPC)"""
+    if vector_index.loaded:
+        hits = vector_index.search(embedding, k=limit + 1)
+        return [
+            {
+                "id": doc_id,
+                "title": vector_index.metadata(doc_id).get("title"),
+                "category_name": vector_index.metadata(doc_id).get("category_name"),
+                "similarity": score,
+            }
+            for doc_id, score in hits
+            if doc_id != exclude_id and score >= threshold
+        ][:limit]
+    result = (
+        supabase.schema("smart_documents")
+        .rpc(
+            "find_near_duplicates",
+            {
+                "query_embedding": [float(value) for value in parse_vector(embedding)],
+                "match_threshold": threshold,
+                "match_count": limit,
+                "exclude_id": exclude_id,
+            },
+        )
+        .execute()
+    )
+    return result.data
+
+
+def duplicate_pairs(matrix: np.ndarray, threshold: float, block_size: int = 1024):
+    """
+    คู่ (i, j, similarity) ที่ i < j และ similarity >= threshold
+    คำนวณทีละ block ขนาด block_size x block_size (ครึ่งบนของ matrix)
+    หน่วยความจำที่ใช้จึงคงที่ไม่ขึ้นกับจำนวนเอกสาร
+    """
+    n = len(matrix)
+    for row_start in range(0, n, block_size):
+        rows_block = matrix[row_start:row_start + block_size]
+        for col_start in range(row_start, n, block_size):
+            scores = rows_block @ matrix[col_start:col_start + block_size].T
+            hits = scores >= threshold
+            if col_start == row_start:
+                # block บนเส้นทแยงมุม: เอาเฉพาะคู่ i < j
+                hits = np.triu(hits, k=1)
+            rows, cols = np.nonzero(hits)
+            for row, col in zip(rows, cols):
+                yield row_start + int(row), col_start + int(col), min(float(scores[row, col]), 1.0)
+
+
+def duplicate_clusters(
+    rows: list[dict],
+    threshold: float = DUPLICATE_THRESHOLD,
+    block_size: int = 1024,
+) -> list[dict]:
+    """รวมคู่เอกสารที่เกือบซ้ำเป็นกลุ่ม (union-find) เรียงจากกลุ่มใหญ่ไปเล็ก"""
+    rows = [row for row in rows if row.get("embedding") is not None]
+    if not rows:
+        return []
+    matrix = to_matrix([row["embedding"] for row in rows])
+    parent = list(range(len(rows)))
+    best = {}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, score in duplicate_pairs(matrix, threshold, block_size):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+        best[i] = max(best.get(i, 0.0), score)
+        best[j] = max(best.get(j, 0.0), score)
+
+    groups = {}
+    for i in best:
+        groups.setdefault(find(i), []).append(i)
+    clusters = [
+        {
+            "size": len(members),
+            "max_similarity": max(best[i] for i in members),
+            "documents": [
+                {
+                    "id": rows[i]["id"],
+                    "title": rows[i].get("title"),
+                    "category_name": rows[i].get("category_name"),
+                }
+                for i in sorted(members, key=lambda i: rows[i]["id"])
+            ],
+        }
+        for members in groups.values()
+    ]
+    return sorted(clusters, key=lambda cluster: (cluster["size"], cluster["max_similarity"]), reverse=True)
+
+
+def duplicate_report(threshold: float = DUPLICATE_THRESHOLD, block_size: int = 1024) -> dict:
+    """รายงานกลุ่มเอกสารเกือบซ้ำของทั้งตาราง documents"""
+    rows = fetch_document_embeddings()
+    clusters = duplicate_clusters(rows, threshold, block_size)
+    return {
+        "threshold": threshold,
+        "documents": len(rows),
+        "clusters": len(clusters),
+        "duplicate_documents": sum(cluster["size"] for cluster in clusters),
+        "items": clusters,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List near-duplicate document clusters")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+    parser.add_argument("--block-size", type=int, default=1024)
+    args = parser.parse_args()
+    print(json.dumps(duplicate_report(args.threshold, args.block_size), ensure_ascii=False, indent=2))
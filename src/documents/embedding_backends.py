@@ -0,0 +1,107 @@
+from openai import OpenAI, AsyncOpenAI
+from dotenv import load_dotenv
+import asyncio
+import os
+import re
+import time
+import zlib
+import numpy as np
+
+load_dotenv()
+
+# ขนาด vector ของ hashing backend (ควรตรงกับขนาดคอลัมน์ vector ในฐานข้อมูล)
+EMBEDDING_HASH_DIM = int(os.getenv("EMBEDDING_HASH_DIM", "1024"))
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class EmbeddingBackend:
+    """interface ของตัวสร้าง embedding"""
+
+    model_name: str = ""
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        raise NotImplementedError
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """embedding server ที่รองรับ OpenAI API (เช่น LM Studio)"""
+
+    def __init__(self, model_name: str, api_key: str, base_url: str):
+        self.model_name = model_name
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.async_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+
+    @staticmethod
+    def _vectors(response) -> list[list[float]]:
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return self._vectors(self.client.embeddings.create(input=texts, model=self.model_name))
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return self._vectors(
+            await self.async_client.embeddings.create(input=texts, model=self.model_name)
+        )
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    embedding แบบ feature hashing ที่คำนวณในโปรเซส (ไม่ต้องมี model server)
+    ผลลัพธ์คงที่ทุกครั้ง เหมาะกับการทดสอบและ benchmark ส่วนของ API
+    ใช้ทั้งคำ และ character 3-gram (รองรับภาษาไทยที่ไม่มีช่องว่างระหว่างคำ)
+    """
+
+    def __init__(self, dim: int = EMBEDDING_HASH_DIM):
+        self.dim = dim
+        self.model_name = f"feature-hashing-{dim}"
+
+    def _features(self, text: str) -> list[str]:
+        features = []
+        for word in WORD_PATTERN.findall(text.casefold()):
+            features.append(word)
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def _embed_one(self, text: str) -> list[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dim] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+def create_embedding_backend(name: str) -> EmbeddingBackend:
+    if name == "hashing":
+        return HashingEmbeddingBackend()
+    if name == "openai":
+        return OpenAIEmbeddingBackend(
+            os.getenv("LM_STUDIO_EMBEDDING_MODEL"),
+            os.getenv("LM_STUDIO_API_KEY"),
+            os.getenv("LM_STUDIO_BASE_URL"),
+        )
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+if __name__ == "__main__":
+    # วัดความเร็วของ hashing backend: python -m src.documents.embedding_backends
+    backend = HashingEmbeddingBackend()
+    texts = [f"เอกสารทดสอบหมายเลข {i} pump model PX-{i} maintenance manual " * 20 for i in range(1000)]
+    started = time.perf_counter()
+    backend.embed(texts)
+    elapsed = time.perf_counter() - started
+    print(f"{backend.model_name}: {len(texts) / elapsed:.0f} texts/s")
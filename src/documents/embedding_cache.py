@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from array import array
+import asyncio
+import hashlib
+import sqlite3
+import threading
+
+
+def normalize_text(text: str) -> str:
+    """ทำให้ข้อความอยู่ในรูปแบบมาตรฐานก่อนคำนวณ hash (ตัดช่องว่างที่ไม่มีผลต่อความหมาย)"""
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    cache ของ embedding โดยใช้ key เป็น (ชื่อ model, hash ของข้อความที่ normalize แล้ว)
+    - ชั้นหน่วยความจำ: LRU จำกัดจำนวนรายการ
+    - ชั้น disk (ไม่บังคับ): sqlite ที่อยู่รอดหลัง restart
+    ใน event loop ให้ใช้ aget_many/aset_many ซึ่งอ่าน/เขียน sqlite ใน thread แยก
+    และเขียนทั้ง batch ใน transaction เดียว (commit ครั้งเดียว)
+    """
+
+    def __init__(self, max_items: int = 10000, db_path: str | None = None):
+        self.max_items = max(0, max_items)
+        self.db_path = db_path or None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get(self, model_name: str, text: str) -> list[float] | None:
+        return self.get_many(model_name, [text])[0]
+
+    def set(self, model_name: str, text: str, vector: list[float]):
+        self.set_many(model_name, [text], [vector])
+
+    def get_many(self, model_name: str, texts: list[str]) -> list[list[float] | None]:
+        """ค้นหาหลายข้อความ: หน่วยความจำก่อน ที่เหลืออ่านจาก sqlite ในคำสั่งเดียว"""
+        keys, results, missing = self._lookup_memory(model_name, texts)
+        if missing and self._db is not None:
+            self._fill_from_disk(keys, results, self._read_disk([keys[i] for i in missing]))
+        return self._count(results, len(texts) - len(missing))
+
+    def set_many(self, model_name: str, texts: list[str], vectors: list[list[float]]):
+        rows = self._remember_many(model_name, texts, vectors)
+        if self._db is not None:
+            self._write_disk(rows)
+
+    async def aget_many(self, model_name: str, texts: list[str]) -> list[list[float] | None]:
+        """เหมือน get_many แต่อ่าน sqlite ใน thread แยก เพื่อไม่บล็อก event loop"""
+        keys, results, missing = self._lookup_memory(model_name, texts)
+        if missing and self._db is not None:
+            found = await asyncio.to_thread(self._read_disk, [keys[i] for i in missing])
+            self._fill_from_disk(keys, results, found)
+        return self._count(results, len(texts) - len(missing))
+
+    async def aset_many(self, model_name: str, texts: list[str], vectors: list[list[float]]):
+        """เหมือน set_many แต่เขียน sqlite ใน thread แยก (ทั้ง batch commit ครั้งเดียว)"""
+        rows = self._remember_many(model_name, texts, vectors)
+        if self._db is not None and rows:
+            await asyncio.to_thread(self._write_disk, rows)
+
+    def _lookup_memory(self, model_name: str, texts: list[str]):
+        keys = [self.make_key(model_name, text) for text in texts]
+        results = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                results.append(vector)
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        return keys, results, missing
+
+    def _fill_from_disk(self, keys: list[str], results: list, found: dict):
+        with self._lock:
+            for i, key in enumerate(keys):
+                if results[i] is None and key in found:
+                    results[i] = found[key]
+                    self._remember(key, found[key])
+
+    def _count(self, results: list, memory_hits: int) -> list:
+        with self._lock:
+            self.memory_hits += memory_hits
+            found = sum(vector is not None for vector in results)
+            self.disk_hits += found - memory_hits
+            self.misses += len(results) - found
+        return results
+
+    def _remember_many(self, model_name: str, texts: list[str], vectors: list[list[float]]) -> list[tuple]:
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model_name, text)
+                self._remember(key, vector)
+                rows.append((key, vector))
+        return rows
+
+    def _read_disk(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._db_lock:
+            # sqlite จำกัดจำนวนพารามิเตอร์ต่อคำสั่ง จึงค้นทีละ 500 key
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                for key, blob in self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ):
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _write_disk(self, rows: list[tuple]):
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in rows],
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, vector: list[float]):
+        if self.max_items == 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_items": len(self._memory),
+            "max_items": self.max_items,
+            "disk_enabled": self._db is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
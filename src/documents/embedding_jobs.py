@@ -0,0 +1,215 @@
+from dotenv import load_dotenv
+from datetime import datetime
+import asyncio
+import os
+import time
+from ..database.supabase import supabase
+from .documents_utils import embed_document, prepare_document_chunks, save_document_chunks
+from .duplicates import DUPLICATE_CHECK_MODE, find_near_duplicates
+from .search_cache import corpus_version
+from .vector_index import vector_index
+
+load_dotenv()
+
+# เปิด/ปิดการสร้าง embedding เบื้องหลัง (false = สร้างก่อนตอบกลับเหมือนเดิม)
+EMBEDDING_ASYNC_WRITES = os.getenv("EMBEDDING_ASYNC_WRITES", "true").lower() == "true"
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+EMBEDDING_JOB_MAX_RETRIES = int(os.getenv("EMBEDDING_JOB_MAX_RETRIES", "3"))
+EMBEDDING_JOB_RETRY_DELAY = float(os.getenv("EMBEDDING_JOB_RETRY_DELAY", "2"))
+
+STATUS_PENDING = "pending"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class EmbeddingJobQueue:
+    """
+    คิวงานสร้าง embedding ของเอกสารที่ทำงานเบื้องหลังด้วย worker หลายตัว
+    - งานของเอกสารเดียวกันที่ยังไม่เริ่ม จะถูกแทนที่ด้วยเนื้อหาล่าสุด
+    - ผลลัพธ์ของงานที่เก่ากว่าเวอร์ชันล่าสุดจะไม่ถูกบันทึกทับ
+    """
+
+    def __init__(self, workers: int, max_retries: int, retry_delay: float):
+        self._workers_count = max(1, workers)
+        self._max_retries = max(0, max_retries)
+        self._retry_delay = retry_delay
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._pending = {}
+        self._latest_version = {}
+        self._version = 0
+        self.in_progress = 0
+        self.processed = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_lag_seconds = 0.0
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or not self._workers or all(w.done() for w in self._workers):
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._workers = [loop.create_task(self._run()) for _ in range(self._workers_count)]
+            for doc_id in self._pending:
+                self._queue.put_nowait(doc_id)
+
+    def enqueue(self, doc_id: int, content: str, check_duplicates: bool = DUPLICATE_CHECK_MODE != "off"):
+        """เพิ่มงานสร้าง embedding ของเอกสาร (ต้องเรียกภายใน event loop)"""
+        self._ensure_workers()
+        self._version += 1
+        self._latest_version[doc_id] = self._version
+        already_queued = doc_id in self._pending
+        self._pending[doc_id] = {
+            "doc_id": doc_id,
+            "content": content,
+            "version": self._version,
+            "check_duplicates": check_duplicates,
+            "enqueued_at": time.monotonic(),
+        }
+        if not already_queued:
+            self._queue.put_nowait(doc_id)
+
+    def forget(self, doc_id: int):
+        """ยกเลิกงานของเอกสารที่ถูกลบแล้ว"""
+        self._pending.pop(doc_id, None)
+        self._latest_version.pop(doc_id, None)
+
+    async def _run(self):
+        while True:
+            doc_id = await self._queue.get()
+            job = self._pending.pop(doc_id, None)
+            if job is None:
+                continue
+            self.in_progress += 1
+            try:
+                await self._process(job)
+            finally:
+                self.in_progress -= 1
+
+    def _is_stale(self, job: dict) -> bool:
+        return self._latest_version.get(job["doc_id"]) != job["version"]
+
+    async def _process(self, job: dict):
+        doc_id = job["doc_id"]
+        for attempt in range(self._max_retries + 1):
+            try:
+                embedding = await embed_document(job["content"], doc_id)
+                chunk_rows = await prepare_document_chunks(doc_id, job["content"])
+                near_duplicates = (
+                    await asyncio.to_thread(find_near_duplicates, embedding, doc_id)
+                    if job["check_duplicates"]
+                    else None
+                )
+                if self._is_stale(job):
+                    return
+                await asyncio.to_thread(save_document_chunks, doc_id, chunk_rows)
+                if near_duplicates:
+                    print(f"⚠️ Document {doc_id} is a near-duplicate of {[item['id'] for item in near_duplicates]}")
+                await asyncio.to_thread(
+                    set_embedding_status,
+                    doc_id,
+                    STATUS_READY,
+                    embedding=embedding,
+                    near_duplicates=near_duplicates,
+                )
+                vector_index.upsert(doc_id, embedding)
+                corpus_version.bump(f"embedding {doc_id}")
+                self._finish(job)
+                self.processed += 1
+                self.last_lag_seconds = time.monotonic() - job["enqueued_at"]
+                return
+            except Exception as e:
+                if attempt < self._max_retries:
+                    self.retries += 1
+                    print(f"⚠️ Embedding job for document {doc_id} failed (attempt {attempt + 1}): {e}")
+                    await asyncio.sleep(self._retry_delay * (2 ** attempt))
+                    if self._is_stale(job):
+                        return
+                    continue
+                print(f"❌ Embedding job for document {doc_id} failed: {e}")
+                self.failed += 1
+                if not self._is_stale(job):
+                    self._finish(job)
+                    try:
+                        await asyncio.to_thread(set_embedding_status, doc_id, STATUS_FAILED, error=str(e))
+                    except Exception as status_error:
+                        print(f"❌ Error updating embedding status of document {doc_id}: {status_error}")
+
+    def _finish(self, job: dict):
+        if not self._is_stale(job):
+            self._latest_version.pop(job["doc_id"], None)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        oldest = min((job["enqueued_at"] for job in self._pending.values()), default=None)
+        return {
+            "enabled": EMBEDDING_ASYNC_WRITES,
+            "workers": self._workers_count,
+            "queue_depth": len(self._pending),
+            "in_progress": self.in_progress,
+            "processed": self.processed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "oldest_pending_seconds": now - oldest if oldest is not None else 0.0,
+            "last_lag_seconds": self.last_lag_seconds,
+        }
+
+
+def set_embedding_status(
+    doc_id: int,
+    embedding_status: str,
+    embedding: list[float] = None,
+    error: str = None,
+    near_duplicates: list[dict] = None,
+):
+    update_data = {
+        "embedding_status": embedding_status,
+        "embedding_error": error,
+        "embedding_updated_at": datetime.utcnow().isoformat(),
+    }
+    if embedding is not None:
+        update_data["embedding"] = embedding
+    if near_duplicates is not None:
+        update_data["near_duplicates"] = near_duplicates
+    supabase.schema("smart_documents").table("documents").update(update_data).eq(
+        "id", doc_id
+    ).execute()
+
+
+embedding_jobs = EmbeddingJobQueue(
+    EMBEDDING_WORKERS, EMBEDDING_JOB_MAX_RETRIES, EMBEDDING_JOB_RETRY_DELAY
+)
+
+
+def fetch_unfinished_documents(after_id: int, limit: int) -> list[dict]:
+    """เอกสารที่สถานะ pending/failed แบบ keyset (id > after_id) เรียงตาม id"""
+    return (
+        supabase.schema("smart_documents")
+        .table("documents")
+        .select("id,data")
+        .in_("embedding_status", [STATUS_PENDING, STATUS_FAILED])
+        .gt("id", after_id)
+        .order("id")
+        .limit(limit)
+        .execute()
+        .data
+    )
+
+
+async def requeue_unfinished_documents(page_size: int = 500) -> int:
+    """
+    เพิ่มเอกสารที่ค้างสถานะ pending/failed (เช่นหลัง restart) กลับเข้าคิว
+    ดึงทีละหน้าใน thread แยก แล้วเพิ่มเข้าคิวใน event loop
+    """
+    last_id = 0
+    requeued = 0
+    while True:
+        page = await asyncio.to_thread(fetch_unfinished_documents, last_id, page_size)
+        if not page:
+            break
+        for item in page:
+            embedding_jobs.enqueue(item["id"], item["data"] or "")
+        requeued += len(page)
+        last_id = page[-1]["id"]
+    return requeued
@@ -1,20 +1,246 @@
-from openai import OpenAI
 from dotenv import load_dotenv
+import asyncio
 import os
+from .embedding_backends import EmbeddingBackend, create_embedding_backend
+from .embedding_cache import EmbeddingCache
+from .text_normalizer import normalizer_totals
+from .ttl_cache import TTLCache
 
 load_dotenv()
 
-model=OpenAI(
-    api_key=os.getenv("LM_STUDIO_API_KEY"),
-    base_url=os.getenv("LM_STUDIO_BASE_URL"),
-)
+# ตัวสร้าง embedding: "openai" = LM Studio/OpenAI API, "hashing" = feature hashing ในโปรเซส (ทดสอบ/benchmark)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# จำนวนข้อความสูงสุดต่อหนึ่ง request ไปยัง /v1/embeddings
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+# เวลาสูงสุด (มิลลิวินาที) ที่รอรวบรวม request ก่อนส่ง batch
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10"))
+# จำนวน batch ที่ส่งไปยัง embedding server พร้อมกันได้
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# จำนวน embedding สูงสุดใน LRU cache และ path ของ sqlite (ว่าง = ไม่ใช้ชั้น disk)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+# cache ของ embedding คำค้น (แยกจาก cache ของเอกสาร เพื่อไม่ให้คำค้นไล่ embedding ของเอกสารออก)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+embedding_backend = create_embedding_backend(EMBEDDING_BACKEND)
+EMBEDDING_MODEL = embedding_backend.model_name
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_PATH)
 
 def get_embedding(text: str) -> list[float]:
-    response = model.embeddings.create(
-        input=text,
-        model=os.getenv("LM_STUDIO_EMBEDDING_MODEL"),
-    )
-    return response.data[0].embedding
+    cached = embedding_cache.get(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
+    embedding = embedding_backend.embed([text])[0]
+    embedding_cache.set(EMBEDDING_MODEL, text, embedding)
+    return embedding
+
+
+class EmbeddingBatcher:
+    """
+    รวม request embedding ที่เข้ามาพร้อมกันเป็น batch เดียว (input=[...])
+    โดยไม่บล็อก event loop ของ uvicorn
+    ข้อความเดียวกันที่รออยู่ในคิวหรือกำลังส่งอยู่ จะใช้ผลลัพธ์ร่วมกัน (ส่งไปที่ model ครั้งเดียว)
+    """
+
+    def __init__(self, backend: EmbeddingBackend, max_batch_size: int, max_wait_ms: float, max_concurrency: int):
+        self._backend = backend
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max(0.0, max_wait_ms) / 1000
+        self._max_concurrency = max(1, max_concurrency)
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._semaphore = None
+        self._in_flight = set()
+        # future ของข้อความที่ยังไม่ได้ผลลัพธ์ (อยู่ในคิวหรือกำลังส่ง) แยกตามข้อความ
+        self._pending = {}
+        self.batches_sent = 0
+        self.texts_sent = 0
+        self.texts_deduplicated = 0
+
+    def _ensure_worker(self):
+        # สร้าง queue/worker ใหม่เมื่อเปลี่ยน event loop (เช่น reload หรือ test)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._in_flight = set()
+            self._pending = {}
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> list[float]:
+        self._ensure_worker()
+        future = self._pending.get(text)
+        if future is not None:
+            self.texts_deduplicated += 1
+        else:
+            future = self._loop.create_future()
+            self._pending[text] = future
+            future.add_done_callback(lambda _, text=text: self._pending.pop(text, None))
+            await self._queue.put((text, future))
+        # shield: ผู้รอคนหนึ่งถูกยกเลิกได้โดยไม่ยกเลิกผลลัพธ์ที่ผู้รอคนอื่นใช้ร่วมกัน
+        return await asyncio.shield(future)
+
+    async def embed_many(self, texts: list[str]) -> list[list[float]]:
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self._max_wait
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._semaphore.acquire()
+            task = self._loop.create_task(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: list):
+        try:
+            vectors = await self._backend.aembed([text for text, _ in batch])
+            self.batches_sent += 1
+            self.texts_sent += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            print(f"❌ Error creating embeddings: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight_batches": len(self._in_flight),
+            "batches_sent": self.batches_sent,
+            "texts_sent": self.texts_sent,
+            "texts_deduplicated": self.texts_deduplicated,
+            "max_batch_size": self._max_batch_size,
+            "max_wait_ms": self._max_wait * 1000,
+        }
+
+
+embedding_batcher = EmbeddingBatcher(
+    embedding_backend,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_MAX_WAIT_MS,
+    EMBEDDING_MAX_CONCURRENCY,
+)
+
+
+async def aget_embedding(text: str) -> list[float]:
+    """สร้าง embedding แบบ async ผ่าน batcher (ไม่บล็อก event loop) โดยตรวจสอบ cache ก่อน"""
+    return (await aget_embeddings([text]))[0]
+
+
+async def aget_embeddings(texts: list[str]) -> list[list[float]]:
+    """สร้าง embedding หลายข้อความ โดยรวมเป็น batch เดียวกับ request อื่นที่เข้ามาพร้อมกัน"""
+    results = await embedding_cache.aget_many(EMBEDDING_MODEL, texts)
+    misses = [i for i, vector in enumerate(results) if vector is None]
+    if misses:
+        vectors = await embedding_batcher.embed_many([texts[i] for i in misses])
+        await embedding_cache.aset_many(EMBEDDING_MODEL, [texts[i] for i in misses], vectors)
+        for i, vector in zip(misses, vectors):
+            results[i] = vector
+    return results
+
+
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+
+def normalize_query(query: str) -> str:
+    """normalize คำค้น (ตัวพิมพ์เล็ก, ช่องว่าง) เพื่อให้คำค้นที่เหมือนกันใช้ cache ร่วมกัน"""
+    return " ".join(query.casefold().split())
+
+
+# embedding ของคำค้นที่กำลังสร้างอยู่ (single-flight): คำค้นเดียวกันที่เข้ามาพร้อมกันรอผลเดียวกัน
+_query_inflight: dict[tuple, asyncio.Future] = {}
+
+
+async def _embed_queries(texts: list[str]) -> dict[str, list[float]]:
+    """
+    สร้าง embedding ของคำค้น (normalize แล้ว) ที่ไม่อยู่ใน cache
+    คำค้นที่ request อื่นกำลังสร้างอยู่จะรอผลนั้นแทนการส่งไป embedding server ซ้ำ
+    """
+    waiting = {
+        text: _query_inflight[(EMBEDDING_MODEL, text)]
+        for text in texts
+        if (EMBEDDING_MODEL, text) in _query_inflight
+    }
+    owned = [text for text in texts if text not in waiting]
+    results = {}
+    if owned:
+        loop = asyncio.get_running_loop()
+        futures = {text: loop.create_future() for text in owned}
+        for text, future in futures.items():
+            _query_inflight[(EMBEDDING_MODEL, text)] = future
+        try:
+            vectors = await embedding_batcher.embed_many(owned)
+            for text, vector in zip(owned, vectors):
+                query_embedding_cache.set((EMBEDDING_MODEL, text), vector)
+                futures[text].set_result(vector)
+                results[text] = vector
+        except asyncio.CancelledError:
+            for future in futures.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+                # ถ้าไม่มีใครรอ ไม่ต้องเตือนว่า exception ไม่ถูกอ่าน
+                future.exception()
+            raise
+        finally:
+            for text in owned:
+                _query_inflight.pop((EMBEDDING_MODEL, text), None)
+    for text, future in waiting.items():
+        # shield: request ที่รออยู่ถูกยกเลิกได้โดยไม่ยกเลิกงานของ request ที่สร้าง embedding
+        results[text] = await asyncio.shield(future)
+    return results
+
+
+async def aget_query_embedding(query: str) -> list[float]:
+    """สร้าง embedding ของคำค้น โดยใช้ cache แบบมี TTL ก่อนเรียก embedding server"""
+    normalized = normalize_query(query)
+    embedding = query_embedding_cache.get((EMBEDDING_MODEL, normalized))
+    if embedding is None:
+        embedding = (await _embed_queries([normalized]))[normalized]
+    return embedding
+
+
+async def aget_query_embeddings(queries: list[str]) -> list[list[float]]:
+    """สร้าง embedding ของคำค้นหลายคำ โดยคำที่ไม่อยู่ใน cache ถูกส่งไปใน batch เดียว"""
+    normalized = [normalize_query(query) for query in queries]
+    results = [query_embedding_cache.get((EMBEDDING_MODEL, text)) for text in normalized]
+    misses = list(dict.fromkeys(text for text, vector in zip(normalized, results) if vector is None))
+    if misses:
+        vectors = await _embed_queries(misses)
+        results = [vector if vector is not None else vectors[text] for text, vector in zip(normalized, results)]
+    return results
+
+
+def embedding_stats() -> dict:
+    return {
+        "backend": EMBEDDING_BACKEND,
+        "model": EMBEDDING_MODEL,
+        "batcher": embedding_batcher.stats(),
+        "cache": embedding_cache.stats(),
+        "query_cache": query_embedding_cache.stats(),
+        "normalizer": dict(normalizer_totals),
+    }
 
 if __name__ == "__main__":
     print(get_embedding("Hello, world!"))
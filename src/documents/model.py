@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class DocumentBase(BaseModel):
@@ -25,10 +25,16 @@ class DocumentResponse(DocumentBase):
     created_by: Optional[str] = None
     created_by_id: Optional[str] = None
     updated_by_id: Optional[str] = None
+    embedding_status: Optional[str] = None  # pending / ready / failed
+    near_duplicates: Optional[List[dict]] = None  # เอกสารที่เนื้อหาเกือบซ้ำ (sql/007_near_duplicates.sql)
 
     class Config:
         from_attributes = True
 
+class DocumentSummary(DocumentResponse):
+    # รายการเอกสารไม่ส่งเนื้อหาเต็มมาโดยค่าเริ่มต้น (ขอได้ด้วย include=data)
+    data: Optional[str] = None
+
 class CategoryBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
     department: Optional[str] = Field(None, max_length=100)
@@ -63,4 +69,22 @@ class DocumentData(BaseModel):
 
 class DocumentPayload(BaseModel):
     docData: DocumentData
-    imgRef: List[ImageReference] = []  # รายการรูปภาพที่ต้องอัปโหลด
\ No newline at end of file
+    imgRef: List[ImageReference] = []  # รายการรูปภาพที่ต้องอัปโหลด
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=50)
+    match_count: int = Field(5, ge=1)
+    match_threshold: float = 0.5
+    filter_category: Optional[str] = None
+    categories: Optional[List[str]] = None
+    department: Optional[str] = None
+    # ค่าที่ไม่ได้ส่งมาจะใช้ค่าเริ่มต้นเดียวกับ GET /public-documents/search
+    quantization: Optional[Literal["none", "binary", "halfvec"]] = None
+    rescore_factor: Optional[int] = Field(None, ge=1, le=20)
+    backend: Optional[Literal["rpc", "index"]] = None
+    mode: Optional[Literal["vector", "hybrid"]] = None
+    diversity: Optional[float] = Field(None, ge=0.0, le=1.0)
+    fields: Optional[str] = None  # ฟิลด์ที่ต้องการ คั่นด้วย comma เช่น id,title,score
+    snippet: bool = False
+    snippet_length: int = Field(200, ge=20, le=2000)
+    highlight: bool = True
@@ -0,0 +1,104 @@
+"""
+รายงาน recall เทียบกับความเร็วของการค้นหาด้วย vector ที่ quantize แล้ว
+เฉพาะโหมดที่ search_document_chunks รองรับ (SEARCH_QUANTIZATION = binary / halfvec + rescoring)
+เทียบกับการค้นหาแบบ exact บน document_chunks.embedding (ตารางเดียวกับที่ใช้ค้นหาจริง)
+คำค้นคือ chunk ที่สุ่มแยกออกจาก corpus
+
+    python -m src.documents.quantization_report --k 10 --rescore-factor 4
+"""
+import argparse
+import time
+import numpy as np
+from ..database.supabase import supabase
+from .vectors import (
+    halfvec_scores,
+    hamming_distances,
+    quantize_binary,
+    quantize_halfvec,
+    rescore,
+    to_matrix,
+    top_k,
+)
+
+
+def fetch_vectors(table: str, limit: int) -> np.ndarray:
+    rows = []
+    page_size = 500
+    last_id = 0
+    while len(rows) < limit:
+        page = (
+            supabase.schema("smart_documents")
+            .table(table)
+            .select("id,embedding")
+            .gt("id", last_id)
+            .not_.is_("embedding", "null")
+            .order("id")
+            .limit(min(page_size, limit - len(rows)))
+            .execute()
+            .data
+        )
+        if not page:
+            break
+        rows.extend(page)
+        last_id = page[-1]["id"]
+    return to_matrix([row["embedding"] for row in rows])
+
+
+def recall_report(matrix: np.ndarray, queries: np.ndarray, k: int = 10, rescore_factor: int = 4) -> dict:
+    """คำนวณ recall@k และเวลาเฉลี่ยต่อคำค้นของแต่ละวิธีเทียบกับ exact search"""
+    # ค่าที่ผ่าน float16 แล้วเก็บเป็น float32 เพื่อไม่ต้องแปลงใหม่ทุกคำค้น (first_stage_bytes นับขนาด float16)
+    half = quantize_halfvec(matrix).astype(np.float32)
+    bits = quantize_binary(matrix)
+    # เหมือน search_document_chunks: candidate ขั้นแรก = k * rescore_factor แล้วคำนวณคะแนนใหม่ด้วย float32
+    candidates_count = k * rescore_factor
+
+    methods = {
+        "exact": lambda q: top_k(matrix @ q, k),
+        "halfvec": lambda q: top_k(halfvec_scores(half, q), k),
+        "halfvec+rescore": lambda q: rescore(matrix, q, top_k(halfvec_scores(half, q), candidates_count), k)[0],
+        "binary": lambda q: top_k(-hamming_distances(bits, q).astype(np.float32), k),
+        "binary+rescore": lambda q: rescore(
+            matrix, q, top_k(-hamming_distances(bits, q).astype(np.float32), candidates_count), k
+        )[0],
+    }
+    storage = {
+        "exact": matrix.nbytes,
+        "halfvec": half.nbytes // 2,
+        "halfvec+rescore": half.nbytes // 2,
+        "binary": bits.nbytes,
+        "binary+rescore": bits.nbytes,
+    }
+
+    truth = [set(methods["exact"](q).tolist()) for q in queries]
+    report = {}
+    for name, search in methods.items():
+        started = time.perf_counter()
+        results = [search(q) for q in queries]
+        elapsed = time.perf_counter() - started
+        hits = sum(len(truth[i] & set(result.tolist())) for i, result in enumerate(results))
+        report[name] = {
+            "recall_at_k": hits / max(1, sum(len(t) for t in truth)),
+            "ms_per_query": elapsed * 1000 / max(1, len(queries)),
+            "first_stage_bytes": storage[name],
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs speed of quantized embeddings")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=100000, help="จำนวน chunk สูงสุดที่ใช้")
+    parser.add_argument("--queries", type=int, default=200, help="จำนวน chunk ที่แยกออกมาใช้เป็นคำค้น")
+    args = parser.parse_args()
+
+    chunks = fetch_vectors("document_chunks", args.limit)
+    held_out = np.zeros(len(chunks), dtype=bool)
+    held_out[np.random.default_rng(0).choice(len(chunks), min(args.queries, len(chunks) // 2), replace=False)] = True
+    corpus, queries = chunks[~held_out], chunks[held_out]
+    print(f"corpus={len(corpus)} queries={len(queries)} k={args.k} rescore_factor={args.rescore_factor}")
+    for name, row in recall_report(corpus, queries, args.k, args.rescore_factor).items():
+        print(
+            f"{name:<16} recall@{args.k}={row['recall_at_k']:.3f} "
+            f"{row['ms_per_query']:.2f} ms/query  {row['first_stage_bytes'] / 1024:.0f} KiB"
+        )
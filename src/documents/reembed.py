@@ -0,0 +1,193 @@
+"""
+สร้าง embedding ใหม่ให้เอกสารทั้งหมด (เช่นหลังเปลี่ยน LM_STUDIO_EMBEDDING_MODEL)
+
+ใช้งานผ่าน CLI:
+    python -m src.documents.reembed --batch-size 32 --concurrency 4
+หรือผ่าน POST /admin/embedding/reembed
+"""
+from dotenv import load_dotenv
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import time
+from ..database.supabase import supabase
+from .embeding import EMBEDDING_MODEL, aget_embeddings
+from .text_normalizer import embedding_text
+from .documents_utils import prepare_document_chunks, save_document_chunks
+from .embedding_jobs import STATUS_PENDING
+from .search_cache import corpus_version
+from .vector_index import vector_index
+
+load_dotenv()
+
+REEMBED_CHECKPOINT_PATH = os.getenv("REEMBED_CHECKPOINT_PATH", ".reembed_checkpoint.json")
+
+# ความคืบหน้าของงานล่าสุด (ใช้แสดงผลผ่าน admin endpoint)
+reembed_progress = {"running": False}
+
+
+def load_checkpoint(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    # เขียนไฟล์ชั่วคราวแล้ว rename เพื่อไม่ให้ checkpoint เสียหายถ้าโปรเซสตายระหว่างเขียน
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def fetch_documents_after(last_id: int, limit: int) -> list[dict]:
+    """ดึงเอกสารแบบ keyset (id > last_id) เรียงตาม id"""
+    return (
+        supabase.schema("smart_documents")
+        .table("documents")
+        .select("id,title,data,last_updated,embedding_status")
+        .gt("id", last_id)
+        .order("id")
+        .limit(limit)
+        .execute()
+        .data
+    )
+
+
+def write_embeddings(items: list[dict]) -> set[int]:
+    """
+    บันทึก embedding หลายเอกสารในคำสั่งเดียว (sql/011_conditional_bulk_update_embeddings.sql)
+    ข้ามเอกสารที่ last_updated เปลี่ยนไปหรือกำลังรอคิว embedding คืนค่า id ที่บันทึกจริง
+    """
+    result = supabase.schema("smart_documents").rpc(
+        "bulk_update_embeddings", {"items": items}
+    ).execute()
+    return set(result.data or [])
+
+
+async def _reembed_batch(batch: list[dict], with_chunks: bool, semaphore: asyncio.Semaphore) -> int:
+    """สร้าง embedding ใหม่ให้ batch คืนค่าจำนวนเอกสารที่ข้าม"""
+    # เอกสาร pending จะได้ embedding จาก model ปัจจุบันผ่านคิวอยู่แล้ว ไม่เขียนแข่งกับ worker
+    docs = [doc for doc in batch if doc.get("embedding_status") != STATUS_PENDING]
+    texts = [embedding_text(doc["data"] or "", doc.get("title")) for doc in docs]
+    # เอกสารที่ไม่มีข้อความเลย ข้ามไป (embedding server ไม่รับข้อความว่าง)
+    docs = [doc for doc, text in zip(docs, texts) if text]
+    texts = [text for text in texts if text]
+    if not docs:
+        return len(batch)
+    async with semaphore:
+        embeddings = await aget_embeddings(texts)
+        written = await asyncio.to_thread(
+            write_embeddings,
+            [
+                {"id": doc["id"], "embedding": embedding, "last_updated": doc.get("last_updated")}
+                for doc, embedding in zip(docs, embeddings)
+            ],
+        )
+        for doc, embedding in zip(docs, embeddings):
+            if doc["id"] in written:
+                vector_index.upsert(doc["id"], embedding)
+        if with_chunks:
+            for doc in docs:
+                if doc["id"] not in written:
+                    continue
+                rows = await prepare_document_chunks(doc["id"], doc["data"] or "")
+                await asyncio.to_thread(save_document_chunks, doc["id"], rows)
+    return len(batch) - len(written)
+
+
+async def reembed_documents(
+    batch_size: int = 32,
+    concurrency: int = 4,
+    with_chunks: bool = True,
+    restart: bool = False,
+    checkpoint_path: str = REEMBED_CHECKPOINT_PATH,
+) -> dict:
+    """
+    สร้าง embedding ใหม่ทีละ batch โดยจำกัดจำนวน batch ที่ทำพร้อมกัน
+    บันทึก checkpoint หลังทุกหน้า เพื่อให้ทำต่อได้หลังโปรเซสล่ม
+    """
+    checkpoint = None if restart else load_checkpoint(checkpoint_path)
+    if checkpoint is None or checkpoint.get("model") != EMBEDDING_MODEL:
+        checkpoint = {
+            "model": EMBEDDING_MODEL,
+            "last_id": 0,
+            "processed": 0,
+            "skipped": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "finished": False,
+        }
+    elif checkpoint.get("finished"):
+        return {**checkpoint, "docs_per_second": 0.0}
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    started = time.monotonic()
+    processed_this_run = 0
+    reembed_progress.update(running=True, **checkpoint)
+
+    try:
+        while True:
+            page = await asyncio.to_thread(
+                fetch_documents_after, checkpoint["last_id"], batch_size * max(1, concurrency)
+            )
+            if not page:
+                break
+            batches = [page[i:i + batch_size] for i in range(0, len(page), batch_size)]
+            skipped = await asyncio.gather(*(_reembed_batch(batch, with_chunks, semaphore) for batch in batches))
+
+            corpus_version.bump("reembed")
+            processed_this_run += len(page)
+            checkpoint["last_id"] = page[-1]["id"]
+            checkpoint["processed"] += len(page)
+            checkpoint["skipped"] = checkpoint.get("skipped", 0) + sum(skipped)
+            await asyncio.to_thread(save_checkpoint, checkpoint_path, checkpoint)
+
+            elapsed = time.monotonic() - started
+            reembed_progress.update(
+                checkpoint, docs_per_second=processed_this_run / elapsed if elapsed else 0.0
+            )
+            print(
+                f"Re-embedded {checkpoint['processed']} documents (last id {checkpoint['last_id']}, "
+                f"{reembed_progress['docs_per_second']:.1f} docs/s)"
+            )
+
+        checkpoint["finished"] = True
+        checkpoint["finished_at"] = datetime.utcnow().isoformat()
+        save_checkpoint(checkpoint_path, checkpoint)
+    finally:
+        reembed_progress["running"] = False
+
+    elapsed = time.monotonic() - started
+    result = {
+        **checkpoint,
+        "processed_this_run": processed_this_run,
+        "elapsed_seconds": elapsed,
+        "docs_per_second": processed_this_run / elapsed if elapsed else 0.0,
+    }
+    reembed_progress.update(result, running=False)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed all documents with the current embedding model")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--no-chunks", action="store_true", help="ไม่สร้าง embedding ของ chunk ใหม่")
+    parser.add_argument("--restart", action="store_true", help="เริ่มใหม่โดยไม่ใช้ checkpoint เดิม")
+    parser.add_argument("--checkpoint", default=REEMBED_CHECKPOINT_PATH)
+    args = parser.parse_args()
+
+    print(
+        asyncio.run(
+            reembed_documents(
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                with_chunks=not args.no_chunks,
+                restart=args.restart,
+                checkpoint_path=args.checkpoint,
+            )
+        )
+    )
@@ -0,0 +1,486 @@
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
+import numpy as np
+from ..database.supabase import supabase
+from .category_cache import department_categories
+from .embeding import EMBEDDING_MODEL, aget_query_embedding, aget_query_embeddings, normalize_query
+from .search_cache import corpus_version, search_cache_key, search_result_cache
+from .vector_index import VECTOR_INDEX_ENABLED, vector_index
+from .vectors import mmr, parse_vector, to_matrix
+from .snippets import make_snippet
+
+load_dotenv()
+
+# การค้นหาขั้นแรกด้วย vector ที่ quantize แล้ว: "none" = exact, "binary", "halfvec"
+# ต้องสร้าง index ของโหมดนี้ด้วย configure_chunk_vector_indexes() (sql/014_chunk_vector_indexes.sql)
+SEARCH_QUANTIZATION = os.getenv("SEARCH_QUANTIZATION", "none")
+# จำนวน candidate ที่นำมาคำนวณคะแนนใหม่ (คูณกับจำนวน candidate ปกติ)
+SEARCH_RESCORE_FACTOR = int(os.getenv("SEARCH_RESCORE_FACTOR", "4"))
+# ค่าเริ่มต้นของแหล่งค้นหา: "rpc" = ฟังก์ชันใน Postgres, "index" = index ในหน่วยความจำ
+SEARCH_BACKEND = "index" if VECTOR_INDEX_ENABLED else "rpc"
+# โหมดค้นหาเริ่มต้น: "vector" หรือ "hybrid" (vector + keyword รวมอันดับด้วย reciprocal rank fusion)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+# ค่าคงที่ k ของ reciprocal rank fusion: score = sum(1 / (k + rank))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+# ค่าเริ่มต้นของ diversity (0 = เรียงตามความเกี่ยวข้องอย่างเดียว, 1 = เน้นความหลากหลายสูงสุด)
+SEARCH_DIVERSITY = float(os.getenv("SEARCH_DIVERSITY", "0"))
+# จำนวน candidate ที่นำมาเลือกแบบ MMR (คูณกับ match_count)
+SEARCH_MMR_CANDIDATE_FACTOR = int(os.getenv("SEARCH_MMR_CANDIDATE_FACTOR", "4"))
+
+
+def format_chunk_result(item: dict) -> dict:
+    return {
+        "id": item["document_id"],
+        "title": item["title"],
+        "content": item["content"],
+        "category": item["category_name"],
+        "score": item["similarity"],
+        "chunk_index": item["chunk_index"],
+        "chunk_offset": item["char_offset"],
+    }
+
+
+def search_chunks(
+    query_embedding: list[float],
+    match_count: int = 5,
+    match_threshold: float = 0.5,
+    filter_category: str | None = None,
+    quantization: str = SEARCH_QUANTIZATION,
+    rescore_factor: int = SEARCH_RESCORE_FACTOR,
+    filter_categories: list[str] | None = None,
+    filter_department: str | None = None,
+) -> list[dict]:
+    """ค้นหา chunk ที่ตรงที่สุดของแต่ละเอกสารผ่าน RPC (sql/006_department_search_filter.sql)"""
+    result = (
+        supabase.schema("smart_documents")
+        .rpc(
+            "search_document_chunks",
+            {
+                "query_embedding": query_embedding,
+                "match_count": match_count,
+                "match_threshold": match_threshold,
+                "filter_category": filter_category,
+                "quantization": None if quantization == "none" else quantization,
+                "rescore_factor": rescore_factor,
+                "filter_categories": filter_categories,
+                "filter_department": filter_department,
+            },
+        )
+        .execute()
+    )
+    return [format_chunk_result(item) for item in result.data]
+
+
+def allowed_categories(
+    filter_category: str | None,
+    filter_categories: list[str] | None,
+    filter_department: str | None,
+) -> list[str] | None:
+    """รวมเงื่อนไขหมวดหมู่/แผนกเป็นรายการหมวดหมู่ที่อนุญาต (None = ไม่กรอง)"""
+    allowed = None
+    for names in (
+        [filter_category] if filter_category else None,
+        filter_categories or None,
+        department_categories(filter_department) if filter_department else None,
+    ):
+        if names is not None:
+            allowed = set(names) if allowed is None else allowed & set(names)
+    return None if allowed is None else sorted(allowed)
+
+
+def best_chunks(doc_ids: list[int], query_embedding: list[float]) -> dict[int, dict]:
+    """
+    chunk ที่ใกล้คำค้นที่สุดของแต่ละเอกสารที่ระบุ (sql/013_best_document_chunks.sql)
+    เลือกในฐานข้อมูล จึงไม่ต้องดึง embedding ของ chunk กลับมา
+    """
+    if not doc_ids:
+        return {}
+    rows = (
+        supabase.schema("smart_documents")
+        .rpc(
+            "best_document_chunks",
+            {"doc_ids": doc_ids, "query_embedding": [float(value) for value in parse_vector(query_embedding)]},
+        )
+        .execute()
+        .data
+    )
+    return {row["document_id"]: {**row, "score": row["similarity"]} for row in rows}
+
+
+def search_index(
+    query_embedding: list[float],
+    match_count: int = 5,
+    match_threshold: float = 0.5,
+    filter_category: str | None = None,
+    with_content: bool = True,
+    filter_categories: list[str] | None = None,
+    filter_department: str | None = None,
+) -> list[dict]:
+    """
+    ค้นหาด้วย index ในหน่วยความจำ (documents.embedding) แล้วดึง chunk ที่ตรงที่สุดของเอกสารที่พบ
+    (ไม่ดึง chunk ถ้า with_content=False)
+    """
+    hits = vector_index.search(
+        query_embedding,
+        k=match_count,
+        threshold=match_threshold,
+        categories=allowed_categories(filter_category, filter_categories, filter_department),
+    )
+    chunks = best_chunks([doc_id for doc_id, _ in hits], query_embedding) if with_content else {}
+    results = []
+    for doc_id, score in hits:
+        metadata = vector_index.metadata(doc_id)
+        chunk = chunks.get(doc_id, {})
+        results.append(
+            {
+                "id": doc_id,
+                "title": metadata.get("title"),
+                "content": chunk.get("content"),
+                "category": metadata.get("category_name"),
+                "score": score,
+                "chunk_index": chunk.get("chunk_index"),
+                "chunk_offset": chunk.get("char_offset"),
+            }
+        )
+    return results
+
+
+def search_keyword(
+    query: str,
+    match_count: int = 5,
+    filter_category: str | None = None,
+    filter_categories: list[str] | None = None,
+    filter_department: str | None = None,
+) -> list[dict]:
+    """ค้นหาด้วยคำ (trigram) ผ่าน RPC (sql/006_department_search_filter.sql)"""
+    result = (
+        supabase.schema("smart_documents")
+        .rpc(
+            "search_document_chunks_keyword",
+            {
+                "query_text": query,
+                "match_count": match_count,
+                "filter_category": filter_category,
+                "filter_categories": filter_categories,
+                "filter_department": filter_department,
+            },
+        )
+        .execute()
+    )
+    return [
+        {**format_chunk_result({**item, "similarity": item["keyword_score"]}), "keyword_score": item["keyword_score"]}
+        for item in result.data
+    ]
+
+
+def fuse_rrf(vector_results: list[dict], keyword_results: list[dict], match_count: int, rrf_k: int = SEARCH_RRF_K) -> list[dict]:
+    """
+    รวมผลลัพธ์ vector และ keyword ด้วย reciprocal rank fusion
+    คืนค่าคะแนนรวม (score) พร้อมคะแนนและอันดับของแต่ละส่วน
+    """
+    fused = {}
+    for component, results in (("vector", vector_results), ("keyword", keyword_results)):
+        for rank, item in enumerate(results, start=1):
+            entry = fused.setdefault(
+                item["id"],
+                {
+                    **item,
+                    "score": 0.0,
+                    "vector_score": None,
+                    "vector_rank": None,
+                    "keyword_score": None,
+                    "keyword_rank": None,
+                },
+            )
+            entry["score"] += 1.0 / (rrf_k + rank)
+            entry[f"{component}_score"] = item["keyword_score"] if component == "keyword" else item["score"]
+            entry[f"{component}_rank"] = rank
+    return sorted(fused.values(), key=lambda item: item["score"], reverse=True)[:match_count]
+
+
+def document_vectors(doc_ids: list[int]) -> dict[int, np.ndarray]:
+    """vector ของเอกสาร จาก index ในหน่วยความจำถ้ามี ไม่เช่นนั้นดึงจาก documents.embedding"""
+    if vector_index.loaded:
+        found = vector_index.vectors(doc_ids)
+    else:
+        found = {}
+    missing = [doc_id for doc_id in doc_ids if doc_id not in found]
+    if missing:
+        rows = (
+            supabase.schema("smart_documents")
+            .table("documents")
+            .select("id,embedding")
+            .in_("id", missing)
+            .execute()
+            .data
+        )
+        rows = [row for row in rows if row.get("embedding") is not None]
+        if rows:
+            matrix = to_matrix([parse_vector(row["embedding"]) for row in rows])
+            found.update({row["id"]: vector for row, vector in zip(rows, matrix)})
+    return found
+
+
+def diversify(results: list[dict], match_count: int, diversity: float) -> list[dict]:
+    """
+    เลือก match_count ผลลัพธ์จาก candidate ด้วย maximal marginal relevance
+    เพื่อไม่ให้เอกสารที่เนื้อหาเกือบเหมือนกันติดอันดับพร้อมกันหลายรายการ
+    """
+    if diversity <= 0 or len(results) <= 1:
+        return results[:match_count]
+    vectors = document_vectors([item["id"] for item in results])
+    dim = len(next(iter(vectors.values()))) if vectors else 1
+    # เอกสารที่ไม่มี vector ใช้ vector ศูนย์ (ไม่ถูกลงโทษเรื่องความซ้ำ)
+    matrix = np.stack([vectors.get(item["id"], np.zeros(dim, dtype=np.float32)) for item in results])
+    # ปรับคะแนนให้อยู่ในช่วง 0-1 เพื่อให้ใช้ได้ทั้งคะแนน cosine และคะแนน RRF
+    scores = np.array([item["score"] or 0.0 for item in results], dtype=np.float32)
+    spread = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / spread if spread else np.ones_like(scores)
+    order = mmr(relevance, matrix, match_count, min(diversity, 1.0))
+    return [results[i] for i in order]
+
+
+def search_vector(
+    query_embedding: list[float],
+    backend: str = SEARCH_BACKEND,
+    match_count: int = 5,
+    match_threshold: float = 0.5,
+    filter_category: str | None = None,
+    quantization: str = SEARCH_QUANTIZATION,
+    rescore_factor: int = SEARCH_RESCORE_FACTOR,
+    with_content: bool = True,
+    filter_categories: list[str] | None = None,
+    filter_department: str | None = None,
+) -> list[dict]:
+    filters = {
+        "filter_category": filter_category,
+        "filter_categories": filter_categories,
+        "filter_department": filter_department,
+    }
+    if backend == "index" and vector_index.loaded:
+        return search_index(
+            query_embedding,
+            match_count=match_count,
+            match_threshold=match_threshold,
+            with_content=with_content,
+            **filters,
+        )
+    return search_chunks(
+        query_embedding,
+        match_count=match_count,
+        match_threshold=match_threshold,
+        quantization=quantization,
+        rescore_factor=rescore_factor,
+        **filters,
+    )
+
+
+async def run_search(
+    query: str,
+    query_embedding: list[float],
+    mode: str = SEARCH_MODE,
+    backend: str = SEARCH_BACKEND,
+    match_count: int = 5,
+    match_threshold: float = 0.5,
+    filter_category: str | None = None,
+    quantization: str = SEARCH_QUANTIZATION,
+    rescore_factor: int = SEARCH_RESCORE_FACTOR,
+    with_content: bool = True,
+    filter_categories: list[str] | None = None,
+    filter_department: str | None = None,
+    diversity: float = SEARCH_DIVERSITY,
+) -> list[dict]:
+    """
+    ค้นหาตามโหมดที่เลือก (vector หรือ hybrid)
+    diversity > 0 จะดึง candidate เพิ่มแล้วเลือกผลลัพธ์ด้วย MMR
+    """
+    filters = {
+        "filter_category": filter_category,
+        "filter_categories": filter_categories or None,
+        "filter_department": filter_department,
+    }
+    vector_kwargs = {
+        "backend": backend,
+        "quantization": quantization,
+        "rescore_factor": rescore_factor,
+        "with_content": with_content,
+        **filters,
+    }
+    fetch_count = match_count * SEARCH_MMR_CANDIDATE_FACTOR if diversity > 0 else match_count
+    if mode != "hybrid":
+        results = await asyncio.to_thread(
+            search_vector,
+            query_embedding,
+            match_count=fetch_count,
+            match_threshold=match_threshold,
+            **vector_kwargs,
+        )
+    else:
+        # ดึง candidate ของแต่ละส่วนมากกว่าจำนวนที่ต้องการ แล้วรวมอันดับ
+        candidates = fetch_count * 2
+        vector_results, keyword_results = await asyncio.gather(
+            asyncio.to_thread(
+                search_vector,
+                query_embedding,
+                match_count=candidates,
+                match_threshold=match_threshold,
+                **vector_kwargs,
+            ),
+            asyncio.to_thread(search_keyword, query, candidates, **filters),
+        )
+        results = fuse_rrf(vector_results, keyword_results, fetch_count)
+    if diversity > 0:
+        results = await asyncio.to_thread(diversify, results, match_count, diversity)
+    return results
+
+
+async def cached_search(query: str, **search_kwargs) -> tuple[list[dict], list[float]]:
+    """
+    ค้นหาผ่าน cache ผลลัพธ์ที่ผูกกับเวอร์ชันของข้อมูล (ไม่ต้องสร้าง embedding และเรียก RPC ซ้ำ)
+    คืนค่า (ผลลัพธ์, embedding ของคำค้น) ผลลัพธ์ที่ได้ใช้ร่วมกับ cache ห้ามแก้ไขโดยตรง
+    """
+    version = corpus_version.value
+    key = search_cache_key(version, normalize_query(query), model=EMBEDDING_MODEL, **search_kwargs)
+    cached = search_result_cache.get(key)
+    if cached is not None:
+        return cached
+    query_embedding = await aget_query_embedding(query)
+    results = await run_search(query, query_embedding, **search_kwargs)
+    search_result_cache.set(key, (results, query_embedding))
+    return results, query_embedding
+
+
+async def cached_search_many(queries: list[str], **search_kwargs) -> list[list[dict]]:
+    """
+    ค้นหาหลายคำค้นพร้อมกัน: ใช้ cache ก่อน คำค้นที่เหลือสร้าง embedding ใน batch เดียว
+    แล้วค้นหาทุกคำค้นพร้อมกัน คืนค่าผลลัพธ์ตามลำดับของ queries
+    """
+    version = corpus_version.value
+    keys = [
+        search_cache_key(version, normalize_query(query), model=EMBEDDING_MODEL, **search_kwargs)
+        for query in queries
+    ]
+    found = {key: search_result_cache.get(key) for key in keys}
+    # คำค้นที่ซ้ำกัน (หลัง normalize) ค้นหาเพียงครั้งเดียว
+    misses = {key: queries[i] for i, key in reversed(list(enumerate(keys))) if found[key] is None}
+    if misses:
+        embeddings = await aget_query_embeddings(list(misses.values()))
+        searched = await asyncio.gather(
+            *(run_search(query, embedding, **search_kwargs) for query, embedding in zip(misses.values(), embeddings))
+        )
+        for key, embedding, data in zip(misses, embeddings, searched):
+            found[key] = (data, embedding)
+            search_result_cache.set(key, found[key])
+    return [found[key][0] for key in keys]
+
+
+def related_documents(doc_id: int, embedding, match_count: int = 5, **search_kwargs) -> list[dict]:
+    """เอกสารที่ใกล้เคียงกับ embedding ของเอกสาร doc_id (ไม่รวมตัวเอง)"""
+    # vector จาก index เป็น numpy array จึงแปลงเป็น float ปกติก่อนส่งให้ RPC
+    query_embedding = [float(value) for value in parse_vector(embedding)]
+    results = search_vector(query_embedding, match_count=match_count + 1, **search_kwargs)
+    return [item for item in results if item["id"] != doc_id][:match_count]
+
+
+async def cached_related(doc_id: int, load_embedding, **search_kwargs) -> list[dict]:
+    """
+    ค้นหาเอกสารที่ใกล้เคียงจาก embedding ที่บันทึกไว้ (ไม่เรียก embedding model)
+    ใช้ vector จาก index ในหน่วยความจำถ้ามี ไม่เช่นนั้นเรียก load_embedding(doc_id)
+    ผลลัพธ์ถูก cache จนกว่าเวอร์ชันของข้อมูลจะเปลี่ยน (รวมถึงการแก้ไขเอกสารนี้)
+    """
+    version = corpus_version.value
+    key = search_cache_key(version, f"related:{doc_id}", **search_kwargs)
+    cached = search_result_cache.get(key)
+    if cached is not None:
+        return cached
+    embedding = vector_index.vectors([doc_id]).get(doc_id)
+    if embedding is None:
+        embedding = await asyncio.to_thread(load_embedding, doc_id)
+    results = await asyncio.to_thread(related_documents, doc_id, embedding, **search_kwargs)
+    search_result_cache.set(key, results)
+    return results
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """แปลง fields=id,title,score เป็นรายการชื่อฟิลด์ (None = ทุกฟิลด์)"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def shape_results(
+    results: list[dict],
+    query: str,
+    fields: list[str] | None = None,
+    snippet: bool = False,
+    snippet_length: int = 200,
+    highlight: bool = True,
+) -> list[dict]:
+    """
+    ย่อผลลัพธ์การค้นหา: snippet แทน content ทั้ง chunk และเลือกเฉพาะฟิลด์ที่ต้องการ
+    snippet_offset คือตำแหน่งของ snippet ในเอกสารต้นฉบับ
+    """
+    shaped = []
+    for item in results:
+        item = dict(item)
+        if snippet and item.get("content") is not None:
+            text, offset = make_snippet(item["content"], query, snippet_length, highlight)
+            item["content"] = text
+            item["snippet_offset"] = (item.get("chunk_offset") or 0) + offset
+        if fields is not None:
+            item = {key: value for key, value in item.items() if key in fields}
+        shaped.append(item)
+    return shaped
+
+
+# ฟิลด์ที่ส่งในเหตุการณ์ content ของการค้นหาแบบ stream (ที่เหลือส่งในเหตุการณ์ result)
+CONTENT_FIELDS = ("content", "chunk_index", "chunk_offset", "snippet_offset")
+
+
+async def stream_results(
+    results: list[dict],
+    query: str,
+    query_embedding: list[float],
+    fields: list[str] | None = None,
+    snippet: bool = False,
+    snippet_length: int = 200,
+    highlight: bool = True,
+):
+    """
+    ส่งผลลัพธ์ทีละเหตุการณ์ (event, data):
+    - "result": ข้อมูลย่อของทุกผลลัพธ์ (ไม่มี content) ส่งก่อน
+    - "content": เนื้อหาของแต่ละผลลัพธ์ตามลำดับ (ดึง chunk ตอนนี้ถ้ายังไม่มี เช่น backend=index)
+    - "done": จบการค้นหา
+    """
+    for rank, item in enumerate(results, start=1):
+        metadata = {key: value for key, value in item.items() if key not in CONTENT_FIELDS}
+        if fields is not None:
+            metadata = {key: value for key, value in metadata.items() if key in fields}
+        yield "result", {"rank": rank, **metadata}
+
+    if fields is None or "content" in fields:
+        missing = [item["id"] for item in results if item.get("content") is None]
+        chunks = await asyncio.to_thread(best_chunks, missing, query_embedding) if missing else {}
+        for rank, item in enumerate(results, start=1):
+            chunk = chunks.get(item["id"])
+            if chunk is not None:
+                item = {
+                    **item,
+                    "content": chunk["content"],
+                    "chunk_index": chunk["chunk_index"],
+                    "chunk_offset": chunk["char_offset"],
+                }
+            shaped = shape_results([item], query, None, snippet, snippet_length, highlight)[0]
+            content = {key: shaped[key] for key in CONTENT_FIELDS if key in shaped}
+            yield "content", {"rank": rank, "id": item["id"], **content}
+
+    yield "done", {"count": len(results)}
+
+
+def format_stream_event(event: str, data: dict, stream_format: str = "ndjson") -> str:
+    """แปลงเหตุการณ์เป็นบรรทัด NDJSON หรือ server-sent event"""
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False) + "\n"
@@ -0,0 +1,58 @@
+from dotenv import load_dotenv
+import os
+import threading
+from .ttl_cache import TTLCache
+
+load_dotenv()
+
+# จำนวนผลการค้นหาที่เก็บใน cache (0 = ปิด cache)
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+# อายุสูงสุดของผลการค้นหาใน cache (วินาที) แม้ข้อมูลจะยังไม่เปลี่ยน
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+
+
+class CorpusVersion:
+    """
+    ตัวนับเวอร์ชันของข้อมูลที่ใช้ค้นหา (เอกสาร หมวดหมู่ embedding)
+    เพิ่มขึ้นทุกครั้งที่ข้อมูลเปลี่ยน ผลการค้นหาใน cache ที่ผูกกับเวอร์ชันเก่าจะไม่ถูกใช้อีก
+    หมายเหตุ: แต่ละ process มีตัวนับของตัวเอง เหมือน index ในหน่วยความจำ
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+        self.last_reason = None
+
+    def bump(self, reason: str = None) -> int:
+        with self._lock:
+            self.value += 1
+            self.last_reason = reason
+        # ผลลัพธ์ของเวอร์ชันเก่าไม่มีทางถูกใช้อีก จึงล้างทิ้งเพื่อคืนหน่วยความจำ
+        search_result_cache.clear()
+        return self.value
+
+
+corpus_version = CorpusVersion()
+search_result_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(value))
+    return value
+
+
+def search_cache_key(version: int, query: str, **params) -> tuple:
+    """
+    key ของผลการค้นหา: (เวอร์ชันข้อมูล, คำค้น, พารามิเตอร์ที่มีผลต่อผลลัพธ์)
+    ต้องอ่าน version ก่อนเริ่มค้นหา เพื่อไม่ให้ผลที่ค้นก่อนข้อมูลเปลี่ยนถูกเก็บเป็นเวอร์ชันใหม่
+    """
+    return (version, query, tuple(sorted((name, _freeze(value)) for name, value in params.items())))
+
+
+def search_cache_stats() -> dict:
+    return {
+        **search_result_cache.stats(),
+        "corpus_version": corpus_version.value,
+        "last_invalidation": corpus_version.last_reason,
+    }
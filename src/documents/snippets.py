@@ -0,0 +1,61 @@
+import html
+import re
+
+HIGHLIGHT_PRE = "<mark>"
+HIGHLIGHT_POST = "</mark>"
+
+
+def query_terms(query: str) -> list[str]:
+    """คำค้นทั้งประโยค และแต่ละคำที่คั่นด้วยช่องว่าง (ภาษาไทยมักไม่มีช่องว่าง จึงใช้ทั้งประโยคด้วย)"""
+    terms = [query.strip()] + query.split()
+    unique = []
+    for term in terms:
+        if term and term.casefold() not in (t.casefold() for t in unique):
+            unique.append(term)
+    # คำยาวก่อน เพื่อให้ highlight คำที่ยาวที่สุดที่ตรงกัน
+    return sorted(unique, key=len, reverse=True)
+
+
+def make_snippet(content: str, query: str, max_length: int = 200, highlight: bool = True) -> tuple[str, int]:
+    """
+    ตัดข้อความเฉพาะช่วงที่มีคำค้นหนาแน่นที่สุด ยาวไม่เกิน max_length
+    คืนค่า (snippet, ตำแหน่งเริ่มต้นใน content)
+    snippet ผ่าน html.escape เสมอ (ไม่ขึ้นกับ highlight) จึงแสดงเป็น HTML ได้อย่างปลอดภัยทุกกรณี
+    max_length นับเฉพาะตัวอักษรของข้อความต้นฉบับ ไม่นับ entity จากการ escape, แท็ก <mark> และ "…"
+    """
+    if not content:
+        return "", 0
+    terms = query_terms(query)
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE) if terms else None
+    positions = [match.start() for match in pattern.finditer(content)] if pattern else []
+
+    start = 0
+    if positions and len(content) > max_length:
+        # หาช่วงยาว max_length ที่มีคำค้นมากที่สุด (two pointers)
+        best_count, best_start, left = 0, positions[0], 0
+        for right, position in enumerate(positions):
+            while position - positions[left] > max_length // 2:
+                left += 1
+            if right - left + 1 > best_count:
+                best_count, best_start = right - left + 1, positions[left]
+        start = max(0, best_start - max_length // 4)
+        # เริ่มที่ขอบคำถ้ามีช่องว่างอยู่ใกล้ๆ
+        space = content.rfind(" ", max(0, start - 20), start + 1)
+        if space != -1 and start > 0:
+            start = space + 1
+        start = min(start, max(0, len(content) - max_length))
+
+    end = min(len(content), start + max_length)
+    window = content[start:end]
+    if highlight and pattern:
+        pieces, last = [], 0
+        for match in pattern.finditer(window):
+            pieces.append(html.escape(window[last:match.start()]))
+            pieces.append(f"{HIGHLIGHT_PRE}{html.escape(match.group(0))}{HIGHLIGHT_POST}")
+            last = match.end()
+        pieces.append(html.escape(window[last:]))
+        window = "".join(pieces)
+    else:
+        window = html.escape(window)
+    snippet = ("…" if start > 0 else "") + window + ("…" if end < len(content) else "")
+    return snippet, start
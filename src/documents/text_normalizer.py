@@ -0,0 +1,102 @@
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# การจัดการ URL: "strip" = ลบทิ้ง, "domain" = เหลือเฉพาะชื่อโดเมน, "keep" = คงไว้
+EMBED_URL_MODE = os.getenv("EMBED_URL_MODE", "domain")
+# การจัดการ code block: "strip" = ลบทิ้ง, "truncate" = เก็บไม่เกิน EMBED_CODE_MAX_LINES บรรทัด, "keep" = คงไว้
+EMBED_CODE_MODE = os.getenv("EMBED_CODE_MODE", "truncate")
+EMBED_CODE_MAX_LINES = int(os.getenv("EMBED_CODE_MAX_LINES", "5"))
+# ลบรูปภาพ markdown ออก (เหลือเฉพาะ alt text ที่มีความหมาย)
+EMBED_STRIP_IMAGES = os.getenv("EMBED_STRIP_IMAGES", "true").lower() == "true"
+
+# alt text ที่ไม่มีความหมายต่อการค้นหา (ค่าเริ่มต้นของ editor)
+BOILERPLATE_ALT_TEXT = {"", "รูปภาพ", "ภาพ", "image", "img", "picture", "photo"}
+
+CODE_BLOCK_PATTERN = re.compile(r"^\s{0,3}(```|~~~)([^\n]*)\n(.*?)^\s{0,3}\1[^\n]*$", re.MULTILINE | re.DOTALL)
+IMAGE_PATTERN = re.compile(r"!\[([^\]]*)\]\(([^)]*)\)")
+LINK_PATTERN = re.compile(r"\[([^\]]+)\]\(([^)]*)\)")
+URL_PATTERN = re.compile(r"\b(?:https?://|blob:https?://|blob:|data:)[^\s)<>\"']+")
+HTML_TAG_PATTERN = re.compile(r"<[^>\n]+>")
+TABLE_RULE_PATTERN = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$", re.MULTILINE)
+HORIZONTAL_RULE_PATTERN = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$", re.MULTILINE)
+SPACES_PATTERN = re.compile(r"[ \t ]+")
+BLANK_LINES_PATTERN = re.compile(r"\n\s*\n+")
+
+# สถิติรวมของทุกเอกสารที่ผ่าน normalizer
+normalizer_totals = {"documents": 0, "chars_before": 0, "chars_after": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """ประมาณจำนวน token แบบคร่าวๆ (~4 ตัวอักษรต่อ token)"""
+    return (len(text) + 3) // 4
+
+
+def _condense_url(url: str) -> str:
+    if EMBED_URL_MODE == "keep":
+        return url
+    if EMBED_URL_MODE == "strip" or url.startswith(("blob:", "data:")):
+        return ""
+    match = re.match(r"https?://([^/:?#]+)", url)
+    return match.group(1) if match else ""
+
+
+def _replace_code_block(match: re.Match) -> str:
+    if EMBED_CODE_MODE == "keep":
+        return match.group(0)
+    if EMBED_CODE_MODE == "strip":
+        return ""
+    language = match.group(2).strip()
+    lines = [line for line in match.group(3).splitlines() if line.strip()]
+    kept = lines[:EMBED_CODE_MAX_LINES]
+    return "\n".join(([language] if language else []) + kept)
+
+
+def _replace_image(match: re.Match) -> str:
+    alt = match.group(1).strip()
+    if not EMBED_STRIP_IMAGES:
+        return match.group(0)
+    return "" if alt.lower() in BOILERPLATE_ALT_TEXT else alt
+
+
+def normalize_for_embedding(text: str) -> str:
+    """ลด token ที่ไม่มีผลต่อความหมายก่อนส่งไปสร้าง embedding"""
+    text = CODE_BLOCK_PATTERN.sub(_replace_code_block, text)
+    text = IMAGE_PATTERN.sub(_replace_image, text)
+    text = LINK_PATTERN.sub(lambda m: m.group(1), text)
+    text = URL_PATTERN.sub(lambda m: _condense_url(m.group(0)), text)
+    text = HTML_TAG_PATTERN.sub(" ", text)
+    text = TABLE_RULE_PATTERN.sub("", text)
+    text = HORIZONTAL_RULE_PATTERN.sub("", text)
+    text = SPACES_PATTERN.sub(" ", text)
+    text = BLANK_LINES_PATTERN.sub("\n", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def embedding_text(text: str, fallback: str | None = None) -> str:
+    """
+    ข้อความที่ส่งไปสร้าง embedding: ข้อความที่ normalize แล้ว
+    ถ้าว่าง (เช่นเอกสารที่มีแต่รูปภาพ/URL) ใช้ fallback (เช่นชื่อเอกสาร) แล้วจึงใช้ข้อความเดิม
+    เพราะ embedding server ไม่รับข้อความว่าง คืนค่า "" ถ้าไม่มีข้อความเหลือเลย
+    """
+    return normalize_for_embedding(text) or (fallback or "").strip() or text.strip()
+
+
+def normalize_with_report(text: str) -> tuple[str, dict]:
+    """
+    normalize ข้อความและคืนค่ารายงานจำนวนตัวอักษร/token ที่ประหยัดได้
+    พร้อมสะสมสถิติรวมใน normalizer_totals
+    """
+    normalized = normalize_for_embedding(text)
+    report = {
+        "chars_before": len(text),
+        "chars_after": len(normalized),
+        "chars_saved": len(text) - len(normalized),
+        "tokens_saved_estimate": estimate_tokens(text) - estimate_tokens(normalized),
+    }
+    normalizer_totals["documents"] += 1
+    normalizer_totals["chars_before"] += report["chars_before"]
+    normalizer_totals["chars_after"] += report["chars_after"]
+    return normalized, report
@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    cache ในหน่วยความจำที่มีอายุ (TTL) และจำกัดจำนวนรายการ
+    เมื่อเต็มจะลบรายการที่หมดอายุก่อน แล้วจึงลบรายการที่ถูกใช้น้อยที่สุด (LFU)
+    หมายเหตุ: การลบเมื่อเต็มไล่ดูทุกรายการ (O(n) ต่อการเพิ่มรายการใหม่ขณะเต็ม)
+    เหมาะกับ cache ขนาดไม่เกินหลักหมื่นรายการ ถ้าใหญ่กว่านั้นควรเปลี่ยนเป็น heap หรือแบ่ง bucket ตามจำนวนครั้งที่ใช้
+    """
+
+    def __init__(self, max_items: int = 1000, ttl_seconds: float = 300):
+        self.max_items = max(0, max_items)
+        self.ttl_seconds = ttl_seconds
+        self._items = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry["expires_at"] <= time.monotonic():
+                del self._items[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            entry["uses"] += 1
+            entry["last_used"] = time.monotonic()
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key, value):
+        if self.max_items == 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._items and len(self._items) >= self.max_items:
+                self._evict(now)
+            self._items[key] = {
+                "value": value,
+                "expires_at": now + self.ttl_seconds,
+                "uses": 0,
+                "last_used": now,
+            }
+
+    def _evict(self, now: float):
+        expired = [key for key, entry in self._items.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del self._items[key]
+        self.expirations += len(expired)
+        if len(self._items) >= self.max_items:
+            victim = min(
+                self._items, key=lambda k: (self._items[k]["uses"], self._items[k]["last_used"])
+            )
+            del self._items[victim]
+            self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._items),
+            "max_items": self.max_items,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,320 @@
+from dotenv import load_dotenv
+import os
+import threading
+import time
+import numpy as np
+from ..database.supabase import supabase
+from .vectors import parse_vector, to_matrix, top_k
+
+load_dotenv()
+
+# เปิดใช้ index ในหน่วยความจำ (สร้างจาก documents.embedding ตอนเริ่มระบบ)
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+# จำนวนเอกสารขั้นต่ำที่จะเปลี่ยนจาก exact (NumPy matrix) เป็น IVF
+VECTOR_INDEX_IVF_THRESHOLD = int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", "20000"))
+# จำนวน cluster ที่ค้นหาต่อคำค้นในโหมด IVF
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+
+
+class VectorIndex:
+    """
+    index ของ documents.embedding ในหน่วยความจำ
+    - corpus เล็ก: ค้นหาแบบ exact ด้วย matrix multiplication
+    - corpus ใหญ่: IVF (k-means) ค้นหาเฉพาะ cluster ที่ใกล้คำค้นที่สุด
+    หมายเหตุ: แต่ละ process มี index ของตัวเอง การแก้ไขจะเห็นเฉพาะใน process ที่รับ request นั้น
+    """
+
+    def __init__(self, ivf_threshold: int = VECTOR_INDEX_IVF_THRESHOLD, nprobe: int = VECTOR_INDEX_NPROBE):
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = max(1, nprobe)
+        self._lock = threading.RLock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+        self._positions = {}
+        self._metadata = {}
+        self._category_codes = np.empty(0, dtype=np.int32)
+        self._category_lookup = {}
+        self._centroids = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._trained_size = 0
+        # train k-means ใหม่ใน thread เบื้องหลัง: ตำแหน่งที่ถูกแก้ไขระหว่าง train ต้องคำนวณ cluster ใหม่ตอนสลับ
+        self._training = False
+        self._dirty_positions = set()
+        # เพิ่มทุกครั้งที่ build ใหม่ ผลการ train ของข้อมูลชุดก่อนจะไม่ถูกสลับเข้ามา
+        self._generation = 0
+        self.loaded = False
+        self.built_at = None
+
+    def __len__(self):
+        return self._size
+
+    def build(self, rows: list[dict]):
+        """สร้าง index ใหม่จากแถว {"id", "embedding", "title", "category_name"}"""
+        rows = [row for row in rows if row.get("embedding") is not None]
+        matrix = to_matrix([row["embedding"] for row in rows]) if rows else np.empty((0, 0), dtype=np.float32)
+        # train ก่อนเข้า lock เพื่อไม่ให้การค้นหาต้องรอ
+        centroids = self._fit_centroids(matrix) if len(rows) >= self.ivf_threshold else None
+        assignments = self._assign(matrix, centroids) if centroids is not None else np.empty(0, dtype=np.int32)
+        with self._lock:
+            self._ids = np.array([row["id"] for row in rows], dtype=np.int64)
+            self._matrix = matrix
+            self._size = len(rows)
+            self._positions = {int(doc_id): i for i, doc_id in enumerate(self._ids)}
+            self._metadata = {
+                row["id"]: {"title": row.get("title"), "category_name": row.get("category_name")}
+                for row in rows
+            }
+            self._category_codes = np.array(
+                [self._category_code(row.get("category_name")) for row in rows], dtype=np.int32
+            )
+            self._centroids = centroids
+            self._assignments = assignments
+            self._trained_size = self._size
+            self._generation += 1
+            self.loaded = True
+            self.built_at = time.time()
+
+    def _category_code(self, category_name: str | None) -> int:
+        return self._category_lookup.setdefault(category_name, len(self._category_lookup))
+
+    def set_metadata(self, doc_id: int, title: str, category_name: str | None):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._metadata[doc_id] = {"title": title, "category_name": category_name}
+            position = self._positions.get(doc_id)
+            if position is not None:
+                self._category_codes[position] = self._category_code(category_name)
+
+    def upsert(self, doc_id: int, embedding, title: str = None, category_name: str = None):
+        # ก่อนโหลด index (หรือเมื่อปิดใช้งาน) ไม่ต้องเก็บการแก้ไข
+        if not self.loaded:
+            return
+        vector = to_matrix([parse_vector(embedding)])[0]
+        with self._lock:
+            if title is not None:
+                self.set_metadata(doc_id, title, category_name)
+            position = self._positions.get(doc_id)
+            if self._size == 0 and not self._matrix.size:
+                self._matrix = np.empty((16, len(vector)), dtype=np.float32)
+                self._ids = np.empty(16, dtype=np.int64)
+                self._category_codes = np.empty(16, dtype=np.int32)
+            if position is None:
+                if self._size == len(self._matrix):
+                    self._grow()
+                position = self._size
+                self._size += 1
+                self._positions[doc_id] = position
+                self._ids[position] = doc_id
+            self._matrix[position] = vector
+            self._category_codes[position] = self._category_code(
+                self._metadata.get(doc_id, {}).get("category_name")
+            )
+            if self._centroids is not None:
+                self._assignments[position] = int(np.argmax(self._centroids @ vector))
+            if self._training:
+                self._dirty_positions.add(position)
+            # train ใหม่เมื่อขนาดเปลี่ยนไปมาก (ใน thread เบื้องหลัง ระหว่างนั้นใช้ centroid เดิม)
+            if self._needs_training():
+                self._start_training()
+
+    def remove(self, doc_id: int):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._metadata.pop(doc_id, None)
+            position = self._positions.pop(doc_id, None)
+            if position is None:
+                return
+            last = self._size - 1
+            if position != last:
+                # ย้ายแถวสุดท้ายมาแทนที่แถวที่ถูกลบ
+                moved_id = int(self._ids[last])
+                self._ids[position] = moved_id
+                self._matrix[position] = self._matrix[last]
+                self._category_codes[position] = self._category_codes[last]
+                if self._centroids is not None:
+                    self._assignments[position] = self._assignments[last]
+                self._positions[moved_id] = position
+                if self._training:
+                    self._dirty_positions.add(position)
+            self._size -= 1
+            # corpus เล็กกว่า threshold แล้วให้กลับไปค้นหาแบบ exact (เงื่อนไขเดียวกับ upsert)
+            if self._needs_training():
+                self._start_training()
+
+    def _grow(self):
+        capacity = max(16, len(self._matrix) * 2)
+        matrix = np.empty((capacity, self._matrix.shape[1]), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        codes = np.empty(capacity, dtype=np.int32)
+        codes[: self._size] = self._category_codes[: self._size]
+        self._matrix, self._ids, self._category_codes = matrix, ids, codes
+        if self._centroids is not None:
+            assignments = np.empty(capacity, dtype=np.int32)
+            assignments[: self._size] = self._assignments[: self._size]
+            self._assignments = assignments
+
+    def _needs_training(self) -> bool:
+        if self._size < self.ivf_threshold:
+            return self._centroids is not None
+        return self._centroids is None or self._size > self._trained_size * 2
+
+    def _start_training(self):
+        """ปิด IVF ทันทีถ้า corpus เล็กลง ไม่เช่นนั้นเริ่ม train ใน thread เบื้องหลัง (ครั้งละหนึ่งงาน)"""
+        if self._size < self.ivf_threshold:
+            self._centroids = None
+            return
+        if self._training:
+            return
+        self._training = True
+        self._dirty_positions = set()
+        snapshot = self._matrix[: self._size].copy()
+        threading.Thread(
+            target=self._train_in_background, args=(snapshot, self._generation), daemon=True
+        ).start()
+
+    def _train_in_background(self, snapshot: np.ndarray, generation: int):
+        try:
+            centroids = self._fit_centroids(snapshot)
+            assignments = self._assign(snapshot, centroids)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                if self._size < self.ivf_threshold:
+                    self._centroids = None
+                    return
+                # แถวที่เพิ่ม/แก้ไข/ย้ายระหว่าง train คำนวณ cluster ใหม่จาก centroid ชุดใหม่
+                current = np.empty(len(self._matrix), dtype=np.int32)
+                kept = min(len(snapshot), self._size)
+                current[:kept] = assignments[:kept]
+                changed = [p for p in self._dirty_positions if p < self._size]
+                changed.extend(range(kept, self._size))
+                if changed:
+                    changed = np.array(changed, dtype=np.int64)
+                    current[changed] = np.argmax(self._matrix[changed] @ centroids.T, axis=1)
+                self._centroids = centroids
+                self._assignments = current
+                self._trained_size = self._size
+        except Exception as e:
+            print(f"❌ Error training vector index: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+                self._dirty_positions = set()
+
+    def _fit_centroids(self, data: np.ndarray, iterations: int = 10) -> np.ndarray:
+        """train k-means สำหรับ IVF (ไม่แตะ state ของ index จึงเรียกนอก lock ได้)"""
+        size = len(data)
+        nlist = max(1, int(np.sqrt(size)))
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(size, nlist, replace=False)].copy()
+        sample = data[rng.choice(size, min(size, nlist * 256), replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[c] = centroid / norm if norm else centroid
+        return centroids
+
+    @staticmethod
+    def _assign(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """cluster ที่ใกล้ที่สุดของแต่ละแถว (ทีละ block เพื่อจำกัดหน่วยความจำ)"""
+        assignments = np.empty(len(data), dtype=np.int32)
+        for start in range(0, len(data), 8192):
+            block = data[start:start + 8192]
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def search(
+        self,
+        query_embedding,
+        k: int = 5,
+        threshold: float = 0.0,
+        categories: list[str] | None = None,
+    ) -> list[tuple[int, float]]:
+        """คืนค่า [(doc_id, cosine similarity)] เรียงจากมากไปน้อย"""
+        query = to_matrix([parse_vector(query_embedding)])[0]
+        with self._lock:
+            if self._size == 0:
+                return []
+            if self._centroids is not None:
+                probes = top_k(self._centroids @ query, self.nprobe)
+                rows = np.flatnonzero(np.isin(self._assignments[: self._size], probes))
+            else:
+                rows = np.arange(self._size)
+            if categories is not None:
+                allowed = [self._category_lookup[c] for c in categories if c in self._category_lookup]
+                rows = rows[np.isin(self._category_codes[rows], allowed)]
+            if not len(rows):
+                return []
+            scores = self._matrix[rows] @ query
+            order = top_k(scores, k)
+            return [
+                (int(self._ids[rows[i]]), float(scores[i]))
+                for i in order
+                if scores[i] > threshold
+            ]
+
+    def vectors(self, doc_ids: list[int]) -> dict[int, np.ndarray]:
+        """vector (normalize แล้ว) ของเอกสารที่อยู่ใน index"""
+        with self._lock:
+            return {
+                doc_id: self._matrix[self._positions[doc_id]].copy()
+                for doc_id in doc_ids
+                if doc_id in self._positions
+            }
+
+    def metadata(self, doc_id: int) -> dict:
+        return self._metadata.get(doc_id, {})
+
+    def stats(self) -> dict:
+        return {
+            "enabled": VECTOR_INDEX_ENABLED,
+            "loaded": self.loaded,
+            "documents": self._size,
+            "mode": "ivf" if self._centroids is not None else "exact",
+            "training": self._training,
+            "clusters": 0 if self._centroids is None else len(self._centroids),
+            "nprobe": self.nprobe,
+            "memory_bytes": int(self._matrix[: self._size].nbytes),
+            "built_at": self.built_at,
+        }
+
+
+vector_index = VectorIndex()
+
+
+def fetch_document_embeddings(page_size: int = 500) -> list[dict]:
+    """ดึง documents.embedding ทั้งหมดแบบ keyset (เฉพาะเอกสารที่มี embedding แล้ว)"""
+    rows = []
+    last_id = 0
+    while True:
+        page = (
+            supabase.schema("smart_documents")
+            .table("documents")
+            .select("id,title,category_name,embedding")
+            .gt("id", last_id)
+            .not_.is_("embedding", "null")
+            .order("id")
+            .limit(page_size)
+            .execute()
+            .data
+        )
+        if not page:
+            break
+        rows.extend(page)
+        last_id = page[-1]["id"]
+    return rows
+
+
+def load_vector_index(page_size: int = 500) -> int:
+    """โหลด documents.embedding ทั้งหมดแล้วสร้าง index"""
+    vector_index.build(fetch_document_embeddings(page_size))
+    return len(vector_index)
@@ -0,0 +1,85 @@
+import json
+import numpy as np
+
+# จำนวนบิตที่เป็น 1 ของแต่ละค่า uint8 (ใช้คำนวณ hamming distance)
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def parse_vector(value) -> list[float] | None:
+    """แปลงค่า vector จาก PostgREST (string "[...]" หรือ list) เป็น list ของ float"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def to_matrix(vectors: list, normalize: bool = True) -> np.ndarray:
+    """รวม vector หลายตัวเป็น matrix float32 (normalize ให้ยาว 1 เพื่อใช้ dot product เป็น cosine)"""
+    matrix = np.asarray([parse_vector(v) for v in vectors], dtype=np.float32)
+    if matrix.ndim != 2:
+        return matrix.reshape(len(vectors), -1)
+    if normalize and len(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """index ของคะแนนสูงสุด k ตัว เรียงจากมากไปน้อย"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def quantize_halfvec(matrix: np.ndarray) -> np.ndarray:
+    """quantize เป็น float16 แบบเดียวกับ halfvec ของ pgvector (ครึ่งหนึ่งของ float32)"""
+    return matrix.astype(np.float16)
+
+
+def quantize_binary(matrix: np.ndarray) -> np.ndarray:
+    """quantize แบบ binary (เครื่องหมายของแต่ละมิติ) บีบอัดเป็น bit"""
+    return np.packbits(matrix > 0, axis=-1)
+
+
+def halfvec_scores(half: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """cosine ระหว่าง vector float16 กับคำค้นที่ quantize แบบเดียวกัน (คำนวณด้วย float32)"""
+    return np.asarray(half, dtype=np.float32) @ quantize_halfvec(query).astype(np.float32)
+
+
+def hamming_distances(bits: np.ndarray, query: np.ndarray) -> np.ndarray:
+    query_bits = quantize_binary(query.reshape(1, -1))[0]
+    return POPCOUNT[np.bitwise_xor(bits, query_bits)].sum(axis=1)
+
+
+def rescore(matrix: np.ndarray, query: np.ndarray, candidates: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """คำนวณคะแนน cosine แบบเต็มความละเอียดเฉพาะ candidate แล้วเลือก k ตัวที่ดีที่สุด"""
+    scores = matrix[candidates] @ query
+    order = top_k(scores, k)
+    return candidates[order], scores[order]
+
+
+def mmr(relevance: np.ndarray, matrix: np.ndarray, k: int, diversity: float) -> np.ndarray:
+    """
+    เรียงลำดับใหม่แบบ maximal marginal relevance
+    เลือกทีละตัวที่ (1 - diversity) * relevance - diversity * (ความคล้ายสูงสุดกับตัวที่เลือกแล้ว) มากที่สุด
+    matrix ต้อง normalize แล้ว คืนค่า index ของ candidate ตามลำดับที่เลือก
+    """
+    k = min(k, len(relevance))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    similarity = matrix @ matrix.T
+    max_similarity = np.zeros(len(relevance), dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    selected = []
+    for _ in range(k):
+        scores = (1.0 - diversity) * relevance - diversity * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return np.array(selected, dtype=np.int64)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query, Response
+from typing import Literal
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
@@ -12,6 +13,7 @@ from ..auth.auth_utils import (
     verify_password,
 )
 from ..database import supabase, upload_profile_image, delete_user_profile_image
+from ..database.pagination import USERS_COUNT, count_method, next_cursor, paginate, set_total_count
 from .model import UserCreate, UserUpdate, UserResponse, ChangePasswordRequest
 import os
 from dotenv import load_dotenv
@@ -477,33 +479,36 @@ async def delete_user(
 
 @router.get("/", response_model=list[UserResponse])
 async def get_all_users(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=1000, description="จำนวนต่อหน้า (ไม่ระบุ = ทั้งหมด)"),
+    offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="cursor จาก header X-Next-Cursor ของหน้าก่อน (ใช้แทน offset)"),
+    count: Literal["none", "exact", "planned", "estimated"] = Query(
+        USERS_COUNT, description="วิธีนับจำนวนทั้งหมดใน header X-Total-Count"
+    ),
     current_user: dict = Depends(is_admin)
 ):
-    """ดึงข้อมูลผู้ใช้ทั้งหมด (เฉพาะ admin และ superadmin)"""
+    """ดึงข้อมูลผู้ใช้ทั้งหมด (เฉพาะ admin และ superadmin) แบ่งหน้าได้ด้วย limit + offset หรือ cursor"""
     try:
+        # superadmin สามารถดูผู้ใช้ทั้งหมด
+        query = supabase.schema("smart_documents").table("users").select("*", count=count_method(count))
         # ตรวจสอบ role ของผู้ใช้ปัจจุบัน
-        if current_user.get("role") == "superadmin":
-            # superadmin สามารถดูผู้ใช้ทั้งหมด
-            users = (
-                supabase.schema("smart_documents")
-                .table("users")
-                .select("*")
-                .execute()
-                .data
-            )
-        else:
+        if current_user.get("role") != "superadmin":
             # admin สามารถดูเฉพาะผู้ใช้ใน department เดียวกัน และไม่ใช่ superadmin
             current_department = current_user.get("department")
-            users = (
-                supabase.schema("smart_documents")
-                .table("users")
-                .select("*")
-                .eq("department", current_department)
-                .neq("role", "superadmin")
-                .execute()
-                .data
-            )
-            
+            query = query.eq("department", current_department).neq("role", "superadmin")
+
+        if limit is None and cursor is None:
+            # ไม่ระบุการแบ่งหน้า คืนค่าทั้งหมดเหมือนเดิม
+            result = query.order("id").execute()
+            users = result.data
+        else:
+            limit = limit or 100
+            result = paginate(query, limit, offset, cursor).execute()
+            users = result.data
+            response.headers["X-Next-Cursor"] = next_cursor(users, limit) or ""
+        set_total_count(response, result)
+
         if not users:
             return []
 
@@ -522,6 +527,8 @@ async def get_all_users(
             )
             for user in users
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,